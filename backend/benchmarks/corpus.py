@@ -0,0 +1,126 @@
+import os
+import random
+from PIL import Image
+
+# Deterministic synthetic brand homepages covering the shapes that stress the pipeline.
+# Pages only reference same-server URLs so the benchmark never touches the network.
+SCENARIOS = ["small_static", "heavy_spa", "huge_dom", "many_stylesheets", "many_svg_logos"]
+
+PALETTE = ["#0a2540", "#635bff", "#00d4ff", "#f6f9fc", "#ff5996", "#1a1f36", "#32325d", "#ffb400"]
+
+def _page(title: str, head: str, body: str) -> str:
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<meta name="description" content="{title} - offline benchmark brand homepage with representative markup.">
+<link rel="icon" href="/static/favicon.png">
+{head}
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+def _header(brand: str) -> str:
+    return f"""<header class="site-header">
+  <a href="/" class="brand-logo"><img src="/static/logo.png" alt="{brand} logo" class="logo"></a>
+  <nav><a href="/about">About</a><a href="/press">Press</a><a href="/brand">Brand</a></nav>
+  <button class="cta">Get started</button>
+</header>"""
+
+def _stylesheet(rng: random.Random, rules: int) -> str:
+    lines = [":root { --brand-primary: #635bff; --brand-dark: #0a2540; }"]
+    for i in range(rules):
+        lines.append(
+            f".c{i} {{ color: {rng.choice(PALETTE)}; background-color: {rng.choice(PALETTE)}; "
+            f"font-family: 'Brand Sans', Helvetica, sans-serif; margin: {i % 16}px; }}"
+        )
+    return "\n".join(lines)
+
+def _svg_logo(rng: random.Random, i: int) -> str:
+    color = rng.choice(PALETTE)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="120" height="40" viewBox="0 0 120 40">'
+        f'<rect width="120" height="40" rx="{i % 8}" fill="{color}"/>'
+        f'<circle cx="20" cy="20" r="{8 + i % 10}" fill="#ffffff"/></svg>'
+    )
+
+def _write(path: str, content, mode: str = "w"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+def build_corpus(root: str, seed: int = 1234) -> str:
+    rng = random.Random(seed)
+    static = os.path.join(root, "static")
+    os.makedirs(static, exist_ok=True)
+
+    Image.new("RGB", (240, 80), color="#635bff").save(os.path.join(static, "logo.png"))
+    Image.new("RGB", (32, 32), color="#0a2540").save(os.path.join(static, "favicon.png"))
+    _write(os.path.join(static, "main.css"), _stylesheet(rng, 200))
+    _write(os.path.join(root, "robots.txt"), "User-agent: *\nAllow: /\n")
+
+    # small_static: server-rendered marketing page
+    body = _header("Small Static") + "".join(
+        f'<section class="c{i}"><h2>Feature {i}</h2><p>{"Lorem ipsum dolor sit amet. " * 8}</p><a href="/f{i}">More</a></section>'
+        for i in range(12)
+    ) + '<footer class="c1">Footer</footer>'
+    _write(os.path.join(root, "small_static", "index.html"),
+           _page("Small Static", '<link rel="stylesheet" href="/static/main.css">', body))
+
+    # heavy_spa: empty shell, large bundle renders everything client side
+    components = "\n".join(
+        f"function Component{i}(){{ const el=document.createElement('section'); el.className='c{i % 200}';"
+        f" el.innerHTML='<h2>Block {i}</h2><p>{'x' * 200}</p><button>Action</button>'; return el; }}"
+        for i in range(1500)
+    )
+    bundle = components + "\n" + "\n".join(
+        ["window.addEventListener('DOMContentLoaded', () => {",
+         "  const root = document.getElementById('root');",
+         "  root.insertAdjacentHTML('beforeend', `" + _header("Heavy SPA").replace("`", "") + "`);",
+         "  setTimeout(() => {",
+         "    for (let i = 0; i < 1500; i++) root.appendChild(window['Component' + i]());",
+         "  }, 50);",
+         "});"]
+    )
+    _write(os.path.join(static, "bundle.js"), bundle)
+    _write(os.path.join(root, "heavy_spa", "index.html"),
+           _page("Heavy SPA", '<link rel="stylesheet" href="/static/main.css"><script src="/static/bundle.js"></script>',
+                 '<div id="root"></div><noscript>' + "Enable JavaScript. " * 40 + "</noscript>"))
+
+    # huge_dom: ~40k elements server side
+    rows = "".join(
+        f'<div class="c{i % 200}"><a href="/p{i}">Item {i}</a><span>{i}</span></div>'
+        for i in range(13000)
+    )
+    _write(os.path.join(root, "huge_dom", "index.html"),
+           _page("Huge DOM", '<link rel="stylesheet" href="/static/main.css">', _header("Huge DOM") + rows))
+
+    # many_stylesheets: 40 external sheets plus inline styles
+    links = []
+    for i in range(40):
+        _write(os.path.join(static, "sheets", f"sheet_{i}.css"), _stylesheet(rng, 60))
+        links.append(f'<link rel="stylesheet" href="/static/sheets/sheet_{i}.css">')
+    inline = "".join(f"<style>{_stylesheet(rng, 20)}</style>" for _ in range(5))
+    body = _header("Many Stylesheets") + "".join(
+        f'<section class="c{i}"><h3>Card {i}</h3><p>{"Brand copy. " * 10}</p></section>' for i in range(40)
+    )
+    _write(os.path.join(root, "many_stylesheets", "index.html"),
+           _page("Many Stylesheets", "\n".join(links) + inline, body))
+
+    # many_svg_logos: external and inline SVG logos in several sizes
+    logos = []
+    for i in range(30):
+        _write(os.path.join(static, "logos", f"logo_{i}.svg"), _svg_logo(rng, i))
+        logos.append(f'<img src="/static/logos/logo_{i}.svg" class="partner-logo" alt="Partner logo {i}">')
+    inline_svgs = "".join(
+        f'<div class="brand-logo" id="logo-{i}">{_svg_logo(rng, i)}</div>' for i in range(20)
+    )
+    body = _header("Many SVG Logos") + "".join(logos) + inline_svgs + "<footer>" + "Partners. " * 50 + "</footer>"
+    _write(os.path.join(root, "many_svg_logos", "index.html"),
+           _page("Many SVG Logos", '<link rel="stylesheet" href="/static/main.css">', body))
+
+    return root
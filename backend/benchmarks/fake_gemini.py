@@ -0,0 +1,81 @@
+import json
+import asyncio
+import hashlib
+
+# Deterministic stand-in for google-genai's Client, just enough surface for GeminiService:
+# client.aio.models.generate_content(model=..., contents=..., config=...)
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt_tokens, len(text) // 4)
+
+class FakeModels:
+    def __init__(self, latency: float, output_chars: int):
+        self.latency = latency
+        self.output_chars = output_chars
+        self.calls = 0
+
+    async def generate_content(self, model: str, contents, config=None):
+        self.calls += 1
+        prompt = contents if isinstance(contents, str) else str(contents)
+        await asyncio.sleep(self.latency)
+
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        if "JSON schema" in prompt:
+            return FakeResponse(self.structured(digest), prompt_tokens=len(prompt) // 4)
+        sections = [
+            "# Brand Identity Report",
+            "## Executive Summary",
+            f"Deterministic benchmark output {digest[:12]}.",
+            "## Visual Identity",
+            "- **Primary color**: #635bff",
+            "- **Secondary color**: #0a2540",
+            "- *Typography*: Brand Sans, Helvetica",
+            "## Brand Voice & Guidelines",
+        ]
+        text = "\n".join(sections)
+        filler = "Keep minimum clear space around the logo. "
+        while len(text) < self.output_chars:
+            text += "\n" + filler * 4
+        return FakeResponse(text[: self.output_chars], prompt_tokens=len(prompt) // 4)
+
+    def structured(self, digest: str) -> str:
+        # Roughly the same amount of content as the Markdown report, as a BrandReport object
+        filler = "Keep minimum clear space around the logo. "
+        report = {
+            "executive_summary": f"Deterministic benchmark output {digest[:12]}.",
+            "palette": [
+                {"hex": "#635bff", "role": "primary", "name": "Blurple", "usage": "Buttons and links"},
+                {"hex": "#0a2540", "role": "secondary", "name": "Navy", "usage": "Headings"},
+            ],
+            "typography": [
+                {"family": "Brand Sans", "role": "heading", "weights": ["600"], "fallback": "Helvetica", "usage": "Titles"},
+                {"family": "Brand Sans", "role": "body", "weights": ["400"], "fallback": "Helvetica", "usage": "Body copy"},
+            ],
+            "logo_rules": [{"rule": filler.strip(), "kind": "do"}, {"rule": "Do not recolor the logo.", "kind": "dont"}],
+            "voice": {"summary": "Confident and clear.", "traits": ["confident", "clear"], "do": [], "dont": []},
+            "sections": [],
+        }
+        text = json.dumps(report)
+        paragraphs = []
+        while len(text) < self.output_chars:
+            paragraphs.append(filler * 4)
+            report["sections"] = [{"heading": "Recommendations", "paragraphs": paragraphs, "bullets": []}]
+            text = json.dumps(report)
+        return text
+
+class FakeAio:
+    def __init__(self, models: FakeModels):
+        self.models = models
+
+class FakeGeminiClient:
+    def __init__(self, latency: float = 0.5, output_chars: int = 4000):
+        self.models = FakeModels(latency, output_chars)
+        self.aio = FakeAio(self.models)
@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import Dict, List, Any
+
+# Run from backend/: python -m benchmarks.run
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.corpus import SCENARIOS, build_corpus
+from benchmarks.fake_gemini import FakeGeminiClient
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines.json")
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve_corpus(root: str) -> ThreadingHTTPServer:
+    handler = functools.partial(QuietHandler, directory=root)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _tree_rss_bytes(root_pid: int) -> int:
+    # Sum RSS of this process and all descendants (Playwright driver + Chromium)
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            pid = int(entry)
+            children.setdefault(int(fields[1]), []).append(pid)
+            rss[pid] = int(fields[21]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+class RSSSampler:
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _tree_rss_bytes(os.getpid()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_job(main, task_id: str, url: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    await main.analyze_brand_task(task_id, url, report_mode=main.REPORT_MODE)
+    elapsed = time.perf_counter() - started
+    status = main.tasks[task_id].get("status")
+    if status != "completed":
+        raise RuntimeError(f"Benchmark job {task_id} ended as {status}: {main.tasks[task_id].get('error')}")
+    stages = {}
+    trace_path = os.path.join("results", task_id, "trace.json")
+    if os.path.exists(trace_path):
+        with open(trace_path) as f:
+            for s in json.load(f):
+                stages[s["stage"]] = stages.get(s["stage"], 0) + s["duration"]
+    main.tasks.pop(task_id, None)
+    return {"seconds": elapsed, "stages": stages}
+
+async def bench_latency(main, base_url: str, repeats: int) -> Dict[str, Any]:
+    results = {}
+    for scenario in SCENARIOS:
+        runs = [await run_job(main, f"lat_{scenario}_{i}", f"{base_url}/{scenario}/") for i in range(repeats)]
+        seconds = [r["seconds"] for r in runs]
+        stage_names = sorted({name for r in runs for name in r["stages"]})
+        results[scenario] = {
+            "p50": statistics.median(seconds),
+            "p95": _percentile(seconds, 95),
+            "stages": {name: statistics.median(r["stages"].get(name, 0) for r in runs) for name in stage_names},
+        }
+        print(f"  {scenario:<18} p50={results[scenario]['p50']:.2f}s p95={results[scenario]['p95']:.2f}s")
+    return results
+
+async def bench_throughput(main, base_url: str, concurrency: int, jobs: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            scenario = SCENARIOS[i % len(SCENARIOS)]
+            return await run_job(main, f"tp{concurrency}_{i}", f"{base_url}/{scenario}/")
+
+    with RSSSampler() as sampler:
+        started = time.perf_counter()
+        runs = await asyncio.gather(*(one(i) for i in range(jobs)))
+        wall = time.perf_counter() - started
+    seconds = [r["seconds"] for r in runs]
+    result = {
+        "jobs": jobs,
+        "wall_seconds": wall,
+        "jobs_per_sec": jobs / wall,
+        "p50": statistics.median(seconds),
+        "p95": _percentile(seconds, 95),
+        "peak_rss_mb": sampler.peak / (1024 * 1024),
+    }
+    print(f"  concurrency={concurrency:<3} {result['jobs_per_sec']:.2f} jobs/s p95={result['p95']:.2f}s peak RSS={result['peak_rss_mb']:.0f}MB")
+    return result
+
+def flatten(report: Dict[str, Any]) -> Dict[str, float]:
+    flat = {}
+    for scenario, values in report["latency"].items():
+        flat[f"latency.{scenario}.p50"] = values["p50"]
+        flat[f"latency.{scenario}.p95"] = values["p95"]
+    for level, values in report["throughput"].items():
+        for key in ("jobs_per_sec", "p95", "peak_rss_mb"):
+            flat[f"throughput.{level}.{key}"] = values[key]
+    for phase in ("import", "warmup"):
+        if phase in report.get("startup", {}):
+            flat[f"startup.{phase}"] = report["startup"][phase]
+    return flat
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    current, previous = flatten(report), flatten(baseline)
+    for key, old in previous.items():
+        new = current.get(key)
+        if new is None or not old:
+            continue
+        higher_is_better = key.endswith("jobs_per_sec")
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        marker = "REGRESSION" if regressed else "ok"
+        print(f"  {key:<45} {old:>9.2f} -> {new:>9.2f} ({change:+.0%}) {marker}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+async def main_async(args) -> int:
+    args.baseline = os.path.abspath(args.baseline)
+    args.output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="brand-bench-")
+    corpus_dir = build_corpus(os.path.join(workdir, "corpus"))
+    os.chdir(workdir)
+    os.environ["SCRAPER_SETTLE_TIME"] = str(args.settle_time)
+    os.environ["TRACE_DUMP"] = "1"
+    os.environ["REPORT_MODE"] = args.report_mode
+    # In-process jobs: lift the app's job and browser-context caps so each level measures its own
+    # concurrency, and nothing polls /status so abandonment must stay off
+    levels = max(args.concurrency)
+    os.environ["JOB_CONCURRENCY"] = str(max(levels, int(os.getenv("JOB_CONCURRENCY", "4"))))
+    os.environ["BROWSER_MAX_CONTEXTS"] = str(max(levels, int(os.getenv("BROWSER_MAX_CONTEXTS", "8"))))
+    os.environ["JOB_ABANDON_AFTER"] = "0"
+
+    import main
+    from services.gemini_service import GeminiService
+    fake = FakeGeminiClient(latency=args.gemini_latency)
+    main.GeminiService = lambda: GeminiService(client=fake)
+    # Same warmup the app runs in its lifespan (minus the real Gemini client)
+    main.warmup.serving()
+    await main.warmup.run(main.browser_pool, lambda: None, main.preload_pdf)
+    print(f"Startup timings: {main.warmup.timings}")
+
+    server = serve_corpus(corpus_dir)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Serving corpus from {corpus_dir} at {base_url}")
+    try:
+        print("Per-scenario latency (concurrency 1):")
+        latency = await bench_latency(main, base_url, args.repeats)
+        print("Throughput:")
+        throughput = {}
+        for level in args.concurrency:
+            throughput[f"c{level}"] = await bench_throughput(main, base_url, level, max(level, args.jobs))
+    finally:
+        server.shutdown()
+        await main.browser_pool.close()
+
+    report = {
+        "config": {
+            "settle_time": args.settle_time,
+            "gemini_latency": args.gemini_latency,
+            "repeats": args.repeats,
+            "jobs": args.jobs,
+            "report_mode": args.report_mode,
+        },
+        "startup": main.warmup.timings,
+        "latency": latency,
+        "throughput": throughput,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        print(f"Comparing against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond tolerance")
+            return 1
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the brand-analysis pipeline")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 16])
+    parser.add_argument("--jobs", type=int, default=16, help="Jobs per throughput level (at least the concurrency)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per scenario for latency")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Seconds the fake Gemini waits per call")
+    parser.add_argument("--settle-time", type=float, default=0.5, help="Scraper settle time (production default is 15s)")
+    parser.add_argument("--report-mode", choices=["markdown", "structured"], default="markdown", help="Two Gemini calls with a Markdown report, or one structured call")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the full JSON report here")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
@@ -1,23 +1,63 @@
+import time
+# Measured from here: everything main.py imports counts toward cold start
+IMPORT_STARTED = time.perf_counter()
+
 import os
 import uuid
 import asyncio
 import aiofiles
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi.responses import PlainTextResponse, FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, List, Literal
+from contextlib import asynccontextmanager
 
-from services.scraper_service import ScraperService
+# Playwright, ReportLab and the computer-use agent are imported by jobs (or by the startup warmup),
+# so /status and cached results are served before they load
+from services.block_detection import BlockedPageError
 from services.asset_manager import AssetManager
-from services.gemini_service import GeminiService
-from services.pdf_generator import PDFGenerator
+from services.gemini_service import GeminiService, get_client
+from services.browser_pool import browser_pool
+from services.warmup import Warmup
+from services.deadline import JobBudget, StageSkipped
+from services.report_schema import guidelines_markdown, to_markdown
+from services.result_store import ResultStore, SECTIONS
+from services.similarity_index import PaletteIndex
+from services.search_index import SearchIndex, FIELDS
+from services.bundle import BundleCache, bundle_files
+from services.http_cache import cached_response, make_etag
+from services.artifacts import ArtifactFiles, IMMUTABLE, REVALIDATE, THUMBNAIL_WIDTHS, precompress, content_versions, current_version, versioned_url, thumbnail_path, thumbnail_url, make_thumbnail
+from services.metrics import registry, span, current_trace, CACHE_LOOKUPS, JOB_SECONDS
 
 # Load env
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI(title="Brand Analysis Agent API")
+warmup = Warmup(IMPORT_STARTED)
+# Set WARMUP=0 to skip preloading (e.g. local development with --reload)
+WARMUP = os.getenv("WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.serving()
+    background = [asyncio.create_task(reconcile_indexes())]
+    if WARMUP:
+        background.append(asyncio.create_task(warmup.run(browser_pool, get_client, preload_pdf)))
+    else:
+        warmup.skip()
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        await browser_pool.close()
+
+def preload_pdf():
+    from services.pdf_generator import PDFGenerator
+    PDFGenerator.preload()
+
+app = FastAPI(title="Brand Analysis Agent API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -28,15 +68,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static directories
 os.makedirs("results", exist_ok=True)
-app.mount("/results", StaticFiles(directory="results"), name="results")
 
-# In-memory store
+# In-memory store of job progress. Completed payloads live only on disk (results/<brand>/data.json)
 tasks: Dict[str, Dict[str, Any]] = {}
+store = ResultStore("results")
+# Cross-brand palette/typography index, updated as jobs finish (results/.index)
+palette_index = PaletteIndex("results/.index")
+# Streamed ZIP exports, cached once complete for range/resume requests (results/.bundles)
+# Kept outside results/ so the static mount can never serve them
+bundle_cache = BundleCache(os.getenv("BUNDLE_DIR", "data/bundles"))
+MAX_BUNDLE_BRANDS = int(os.getenv("MAX_BUNDLE_BRANDS", "50"))
+# Full-text index (SQLite FTS5) over reports, guidelines, fonts and CSS design tokens
+search_index = SearchIndex("results/.index/search.db", "results")
+
+# Escalation tier: only pages the scraper reports as blocked go to the computer-use agent,
+# under their own concurrency cap and a strict turn/time budget
+ESCALATION_TURN_LIMIT = int(os.getenv("ESCALATION_TURN_LIMIT", "8"))
+ESCALATION_TIME_BUDGET = float(os.getenv("ESCALATION_TIME_BUDGET", "180"))
+escalation_slots = asyncio.Semaphore(int(os.getenv("ESCALATION_CONCURRENCY", "2")))
+
+REPORT_MODE = os.getenv("REPORT_MODE", "markdown")
+
+# Per-job deadline spread across the pipeline stages; when it runs out the job finishes with
+# a partial result (and PDF) instead of failing. JOB_FINALIZE_RESERVE seconds are kept for the PDF.
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "240"))
+JOB_FINALIZE_RESERVE = float(os.getenv("JOB_FINALIZE_RESERVE", "20"))
+# Jobs running at once; more wait queued so Chromium/Gemini load per instance stays predictable
+job_slots = asyncio.Semaphore(int(os.getenv("JOB_CONCURRENCY", "4")))
+# Cancel jobs whose client stopped polling /status for this long (0 disables); off by default since
+# API clients may start a job and fetch the result later. Pollers opt in per request (abandon_after).
+JOB_ABANDON_AFTER = float(os.getenv("JOB_ABANDON_AFTER", "0"))
+running_jobs: Dict[str, JobBudget] = {}
+
+# Per-job span dump to results/<brand>/trace.json (set TRACE_DUMP=0 to disable)
+TRACE_DUMP = os.getenv("TRACE_DUMP", "1") == "1"
+# Upper bound for a crawl request's max_pages; the crawl also stops at its time budget
+MAX_CRAWL_PAGES = int(os.getenv("MAX_CRAWL_PAGES", "20"))
 
 class AnalysisRequest(BaseModel):
     url: str
+    # Optional multi-page crawl: follow same-origin brand pages (about, press, guidelines...)
+    crawl: bool = False
+    max_pages: int = Field(5, ge=1, le=MAX_CRAWL_PAGES)
+    # Skip the homepage screenshot; lets server-rendered sites use the static (no-Chromium) tier
+    screenshot: bool = True
+    # "markdown" (guideline search + Markdown report) or "structured" (one call, typed report);
+    # defaults to REPORT_MODE so the two can be A/B tested per request or per deployment
+    report_mode: Optional[Literal["markdown", "structured"]] = None
+    # Extra views of the homepage captured in parallel with the desktop one
+    variants: List[Literal["mobile", "dark"]] = []
+    # Seconds without a /status poll after which the job is cancelled; defaults to JOB_ABANDON_AFTER
+    abandon_after: Optional[float] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_crawl_options(self):
+        # The crawler always screenshots the homepage and only captures the desktop view
+        if self.crawl and (self.variants or not self.screenshot):
+            raise ValueError("crawl does not support variants or screenshot=false")
+        return self
 
 # ... imports ...
 from urllib.parse import urlparse
@@ -52,29 +142,56 @@ def get_brand_id(url: str) -> str:
         hostname = hostname[4:]
     return hostname.split(':')[0].replace('.', '_')
 
-async def analyze_brand_task(task_id: str, url: str): # task_id is now brand_id
+def valid_brand_id(brand_id: str) -> bool:
+    # Brand ids are single path segments; dot-directories (.index, .bundles) are not brands
+    return bool(brand_id) and not brand_id.startswith(".") and "/" not in brand_id and os.sep not in brand_id
+
+async def analyze_brand_task(task_id: str, url: str, crawl: bool = False, max_pages: int = 5, screenshot: bool = True, report_mode: str = None, variants: List[str] = None, abandon_after: float = None): # task_id is now brand_id
+    report_mode = report_mode or REPORT_MODE
     tasks[task_id] = tasks.get(task_id, {})
     tasks[task_id].update({"status": "processing", "progress": 0, "logs": []})
+    tasks[task_id].setdefault("last_polled", time.monotonic())
     
     def log(msg):
         print(f"[{task_id}] {msg}")
         if "logs" in tasks[task_id]:
             tasks[task_id]["logs"].append(msg)
 
+    trace = []
+    current_trace.set(trace)
+    job_started = time.perf_counter()
+    started_warm = warmup.done
+    cache_hit = False
+    holding_slot = False
+    watchdog = None
+    brand_id = task_id # Use brand_id as task_id
+
     try:
-        brand_id = task_id # Use brand_id as task_id
-        
-        # Check if already done (simple check: data.json exists)
-        if os.path.exists(f"results/{brand_id}/data.json"):
+        # Check if already done (simple check: data.json exists and isn't a partial result)
+        if store.is_complete(brand_id):
+            CACHE_LOOKUPS.inc(cache="data_json", result="hit")
+            cache_hit = True
             log("Found existing data. Reusing...")
-            async with aiofiles.open(f"results/{brand_id}/data.json", "r") as f:
-                data = json.loads(await f.read())
-                tasks[task_id]["data"] = data
-                tasks[task_id]["status"] = "completed"
-                tasks[task_id]["progress"] = 100
-                return
-
-        scraper = ScraperService()
+            complete_task(task_id)
+            return
+        CACHE_LOOKUPS.inc(cache="data_json", result="miss")
+
+        # Bounded worker occupancy: at most JOB_CONCURRENCY jobs run, the rest wait here
+        tasks[task_id]["status"] = "queued"
+        await job_slots.acquire()
+        holding_slot = True
+        tasks[task_id]["status"] = "processing"
+        # The deadline starts once the job has a slot
+        budget = JobBudget(JOB_DEADLINE, finalize_reserve=JOB_FINALIZE_RESERVE)
+        running_jobs[task_id] = budget
+        watchdog = asyncio.create_task(watch_client(task_id, budget, JOB_ABANDON_AFTER if abandon_after is None else abandon_after))
+
+        from services.scraper_service import ScraperService
+        from services.crawler_service import CrawlerService
+        from services.pdf_generator import PDFGenerator
+
+        scrape_budget = budget.slice("scrape")
+        scraper = ScraperService(time_budget=scrape_budget)
         assets = AssetManager("results")
         gemini = GeminiService()
         pdf_gen = PDFGenerator()
@@ -85,76 +202,312 @@ async def analyze_brand_task(task_id: str, url: str): # task_id is now brand_id
         
         # Step 1: Scrape
         tasks[task_id]["progress"] = 10
-        log(f"Scraping {url}...")
-        brand_data = await scraper.analyze_url(url)
+
+        scrape_deadline = time.monotonic() + scrape_budget
+
+        async def scrape() -> Dict[str, Any]:
+            try:
+                if crawl:
+                    log(f"Crawling {url} (up to {max_pages} pages)...")
+                    # Wrap up the crawl a little before the slice so pages already visited are merged
+                    crawler = CrawlerService(scraper, max_pages=max_pages, time_budget=min(120.0, scrape_budget * 0.85))
+                    data = await crawler.crawl(url)
+                    log(f"Crawled {len(data.get('pages', []))} pages.")
+                else:
+                    log(f"Scraping {url}" + (f" (+ {', '.join(variants)} views)..." if variants else "..."))
+                    data = await scraper.analyze(url, screenshot=screenshot, variants=variants)
+                data["extraction"] = "scraper"
+            except BlockedPageError as e:
+                data = await escalate_to_agent(url, scraper, e.reason, log, scrape_deadline)
+            return data
+
+        try:
+            with span("pipeline.scrape", crawl=crawl, budget=round(scrape_budget, 1)):
+                brand_data = await budget.run("scrape", scrape())
+            log("Scraping complete.")
+        except StageSkipped as e:
+            log(f"Scraping stopped ({e.reason}); continuing with a partial result.")
+            budget.skipped(e.stage)
+            brand_data = empty_brand_data(url)
         tasks[task_id]["progress"] = 40
-        log("Scraping complete.")
         
         # Step 2: Save Assets
         log("Saving assets...")
-        await assets.save_screenshot(brand_id, brand_data["screenshot"])
-        brand_asset_paths = await assets.save_assets(brand_id, brand_data["assets"])
-        await assets.save_fonts(brand_id, brand_data["fonts"])
+
+        async def save_brand_assets():
+            if brand_data.get("screenshot"):
+                await assets.save_screenshot(brand_id, brand_data["screenshot"])
+            for name, shot in brand_data.get("variant_screenshots", {}).items():
+                await assets.save_screenshot(brand_id, shot, f"{name}.png")
+            await assets.save_fonts(brand_id, brand_data["fonts"])
+            return await assets.save_assets(brand_id, brand_data["assets"])
+
+        try:
+            with span("pipeline.save_assets"):
+                # Logos and stylesheets download side by side within the same slice
+                brand_asset_paths, css_asset_paths = await budget.run("assets", asyncio.gather(
+                    save_brand_assets(),
+                    assets.save_css(brand_id, brand_data["css"]),
+                ))
+        except StageSkipped as e:
+            log(f"Saving assets stopped ({e.reason}); keeping what was downloaded.")
+            brand_asset_paths = saved_files(brand_id, "Brand Assets")
+            css_asset_paths = saved_files(brand_id, "CSS")
         
         log("Generating color swatches...")
-        color_asset_paths = await assets.save_color_images(brand_id, brand_data["colors"])
-        
-        log("Saving CSS assets...")
-        css_asset_paths = await assets.save_css(brand_id, brand_data["css"])
+        with span("pipeline.color_swatches"):
+            color_asset_paths = await assets.save_color_images(brand_id, brand_data["colors"])
         
         tasks[task_id]["progress"] = 60
         
-        # Step 3: Gemini Search & Grounding
-        log("Searching Brand Guidelines with Gemini...")
-        guidelines_text = await gemini.search_brand_guidelines(brand_data["title"], url)
-        async with aiofiles.open(f"results/{brand_id}/Google Search/guidelines.txt", "w") as f:
-            await f.write(guidelines_text)
-        tasks[task_id]["progress"] = 80
+        # Steps 3-4: either one grounded call returning a typed BrandReport ("structured"), or the
+        # guideline search followed by a free-form Markdown report ("markdown")
+        structured = None
+        if report_mode == "structured":
+            log("Researching guidelines and compiling the report in one Gemini call...")
+            try:
+                with span("pipeline.structured_report"):
+                    structured = await budget.run("report", gemini.generate_structured_report(brand_data, url))
+                if structured is None:
+                    log("Structured report was unusable; falling back to the Markdown report.")
+            except StageSkipped as e:
+                log(f"Structured report stopped ({e.reason}).")
+        if structured:
+            guidelines_text = guidelines_markdown(structured)
+            report_text = to_markdown(structured, brand_data["title"])
+            async with aiofiles.open(f"results/{brand_id}/Google Search/guidelines.txt", "w") as f:
+                await f.write(guidelines_text)
+            await asyncio.to_thread(precompress, f"results/{brand_id}/Google Search/guidelines.txt")
+            tasks[task_id]["progress"] = 80
+        else:
+            # Step 3: Gemini Search & Grounding
+            log("Searching Brand Guidelines with Gemini...")
+            try:
+                with span("pipeline.guidelines"):
+                    guidelines_text = await budget.run("guidelines", gemini.search_brand_guidelines(brand_data["title"], url))
+                    async with aiofiles.open(f"results/{brand_id}/Google Search/guidelines.txt", "w") as f:
+                        await f.write(guidelines_text)
+                    await asyncio.to_thread(precompress, f"results/{brand_id}/Google Search/guidelines.txt")
+            except StageSkipped as e:
+                log(f"Guideline search stopped ({e.reason}).")
+                guidelines_text = ""
+            tasks[task_id]["progress"] = 80
         
-        # Step 4: Generate Report
-        log("Compiling final report...")
-        report_text = await gemini.compile_final_report(brand_data, guidelines_text)
+            # Step 4: Generate Report
+            log("Compiling final report...")
+            try:
+                with span("pipeline.report"):
+                    report_text = await budget.run("report", gemini.compile_final_report(brand_data, guidelines_text))
+            except StageSkipped as e:
+                log(f"Report generation stopped ({e.reason}); using the extracted data only.")
+                report_text = partial_report(brand_data, guidelines_text, budget.incomplete)
         
-        # Step 5: PDF
+        
+        # Step 5: PDF, from whatever finished; runs in the finalize reserve even if the stages ran out
         log("Generating PDF...")
-        pdf_path = pdf_gen.generate_pdf(brand_id, "results", brand_data["title"], report_text, color_assets=color_asset_paths, brand_assets=brand_asset_paths, css_assets=css_asset_paths)
+        pdf_path = None
+        # The worker thread can't be cancelled, so it gets the deadline itself and drops a late PDF;
+        # the grace second lets it finish that check before we stop waiting
+        pdf_deadline = time.monotonic() + max(JOB_FINALIZE_RESERVE, budget.deadline - time.monotonic())
+        try:
+            with span("pipeline.pdf"):
+                pdf_path = await asyncio.wait_for(
+                    asyncio.to_thread(pdf_gen.generate_pdf, brand_id, "results", brand_data["title"], report_text, color_assets=color_asset_paths, brand_assets=brand_asset_paths, css_assets=css_asset_paths, report=structured.model_dump() if structured else None, deadline=pdf_deadline),
+                    timeout=pdf_deadline - time.monotonic() + 1,
+                )
+        except asyncio.TimeoutError:
+            pass
+        if not pdf_path and time.monotonic() > pdf_deadline:
+            log("PDF generation exceeded the job deadline.")
+            budget.skipped("pdf")
         
         # Finalize
         if "screenshot" in brand_data:
             del brand_data["screenshot"]
+        variant_names = list(brand_data.pop("variant_screenshots", {}))
             
+        asset_files = [os.path.basename(p) for p in saved_files(brand_id, "Brand Assets")]
+        css_files = [os.path.basename(p) for p in saved_files(brand_id, "CSS")]
+        has_snapshot = os.path.exists(f"results/{brand_id}/Snapshot/homepage.png")
+        variant_shots = [f"Snapshot/{name}.png" for name in variant_names if os.path.exists(f"results/{brand_id}/Snapshot/{name}.png")]
+        pdf_file = os.path.basename(pdf_path) if pdf_path else None
+        # One hash per artifact, shared by its download and thumbnail URLs
+        versions = await asyncio.to_thread(content_versions, "results", brand_id, [
+            *([pdf_file] if pdf_file else []),
+            *(["Snapshot/homepage.png"] if has_snapshot else []),
+            *variant_shots,
+            *[f"Brand Assets/{f}" for f in asset_files],
+            *[f"CSS/{f}" for f in css_files],
+        ])
+
+        def url(path):
+            return versioned_url("results", brand_id, path, versions.get(path))
+
         final_data = {
             "brand_data": brand_data,
             "guidelines": guidelines_text,
             "report": report_text,
-            "pdf_url": f"/results/{brand_id}/{os.path.basename(pdf_path)}" if pdf_path else None,
-            "screenshot_url": f"/results/{brand_id}/Snapshot/homepage.png",
-            "assets_urls": [
-                f"/results/{brand_id}/Brand Assets/{f}" 
-                for f in os.listdir(f"results/{brand_id}/Brand Assets") 
-                if not f.startswith('.')
-            ],
-            "css_urls": [
-                f"/results/{brand_id}/CSS/{f}"
-                for f in os.listdir(f"results/{brand_id}/CSS")
-                if not f.startswith('.')
-            ]
+            "pdf_url": url(pdf_file) if pdf_file else None,
+            "screenshot_url": url("Snapshot/homepage.png") if has_snapshot else None,
+            "variant_screenshot_urls": {os.path.basename(p)[:-4]: url(p) for p in variant_shots},
+            "assets_urls": [url(f"Brand Assets/{f}") for f in asset_files],
+            "css_urls": [url(f"CSS/{f}") for f in css_files],
+            # Small WebP previews for grid views
+            "thumbnail_urls": {
+                "screenshot": thumbnail_url(brand_id, "Snapshot/homepage.png", 640, versions.get("Snapshot/homepage.png")) if has_snapshot else None,
+                "assets": [
+                    thumbnail_url(brand_id, f"Brand Assets/{f}", 160, versions.get(f"Brand Assets/{f}"))
+                    for f in asset_files
+                ],
+            },
+            "report_mode": "structured" if structured else "markdown",
+            "report_structured": structured.model_dump() if structured else None,
+            # Stages cut short by the deadline or a cancel; partial results are re-run on the next /analyze
+            "partial": bool(budget.incomplete),
+            "incomplete_stages": budget.incomplete,
+            "cancel_reason": budget.cancel_reason,
         }
         
         # Save data.json for reuse
-        async with aiofiles.open(f"results/{brand_id}/data.json", "w") as f:
-            await f.write(json.dumps(final_data, default=str)) # handle non-serializable if any
+        await store.save(brand_id, final_data)
 
-        tasks[task_id]["data"] = final_data
-        
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["progress"] = 100
-        log("Analysis complete!")
+        log("Indexing results...")
+        with span("pipeline.index"):
+            try:
+                await asyncio.to_thread(palette_index.add, brand_id, final_data)
+            except Exception as e:
+                print(f"[{brand_id}] Could not update similarity index: {e}")
+            try:
+                await asyncio.to_thread(search_index.upsert, brand_id, final_data, store.version(brand_id))
+            except Exception as e:
+                print(f"[{brand_id}] Could not update search index: {e}")
+
+        if budget.incomplete:
+            log(f"Analysis finished with a partial result (incomplete: {', '.join(budget.incomplete)}).")
+        else:
+            log("Analysis complete!")
+        complete_task(task_id, partial=bool(budget.incomplete))
 
     except Exception as e:
         log(f"Error: {str(e)}")
         tasks[task_id]["status"] = "failed"
         tasks[task_id]["error"] = str(e)
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        running_jobs.pop(task_id, None)
+        if holding_slot:
+            job_slots.release()
+        JOB_SECONDS.observe(time.perf_counter() - job_started, status="cached" if cache_hit else tasks[task_id].get("status"))
+        if not cache_hit:
+            warmup.job_finished(time.perf_counter() - job_started, tasks[task_id].get("status"), started_warm)
+        if TRACE_DUMP and not cache_hit:
+            await dump_trace(brand_id, trace)
+
+async def watch_client(task_id: str, budget: JobBudget, abandon_after: float):
+    # Nobody has polled /status for a while: the client went away, stop spending on the job
+    if not abandon_after:
+        return
+    while not budget.cancelled:
+        await asyncio.sleep(5)
+        last_polled = tasks.get(task_id, {}).get("last_polled", budget.started)
+        if time.monotonic() - max(last_polled, budget.started) > abandon_after:
+            print(f"[{task_id}] No status polls for {abandon_after:.0f}s; cancelling")
+            budget.cancel("abandoned")
+
+def empty_brand_data(url: str) -> Dict[str, Any]:
+    # Skeleton used when the scrape stage produced nothing in time
+    return {
+        "url": url,
+        "title": urlparse(url).netloc or url,
+        "screenshot": None,
+        "assets": [],
+        "fonts": [],
+        "colors": [],
+        "css": [],
+        "extraction": "none",
+    }
+
+def saved_files(brand_id: str, folder: str) -> list:
+    path = f"results/{brand_id}/{folder}"
+    if not os.path.isdir(path):
+        return []
+    return [
+        os.path.join(path, f) for f in sorted(os.listdir(path))
+        if not f.startswith('.') and not f.endswith(('.gz', '.br'))
+    ]
+
+def partial_report(brand_data: Dict[str, Any], guidelines_text: str, incomplete: list) -> str:
+    # Report from the extracted data alone, when Gemini didn't finish within the deadline
+    lines = [
+        f"# {brand_data.get('title', 'Brand')} Brand Report",
+        "",
+        f"*Partial result: {', '.join(incomplete)} did not finish within the time budget.*",
+        "",
+        "## Colors",
+        *[f"- {c}" for c in brand_data.get("colors", [])[:20]],
+        "",
+        "## Typography",
+        *[f"- {f}" for f in brand_data.get("fonts", [])[:20]],
+    ]
+    if guidelines_text:
+        lines += ["", "## Brand Guidelines", guidelines_text]
+    return "\n".join(lines)
+
+async def escalate_to_agent(url: str, scraper, reason: str, log, deadline: float) -> Dict[str, Any]:
+    # Runs inside the scrape stage, so it gets whatever is left of that slice (at most
+    # ESCALATION_TIME_BUDGET) once a slot is free; running out ends the stage like any other
+    from services.gemini_computer_use_service import GeminiComputerUseService
+    log(f"Scraper was blocked ({reason}). Escalating to computer-use agent...")
+    async with escalation_slots:
+        timeout = min(ESCALATION_TIME_BUDGET, deadline - time.monotonic())
+        with span("pipeline.escalation", reason=reason, budget=round(timeout, 1)):
+            if timeout <= 0:
+                raise StageSkipped("scrape", f"no time left to escalate (blocked: {reason})")
+            agent = GeminiComputerUseService()
+            try:
+                brand_data = await asyncio.wait_for(
+                    agent.extract_brand_data(url, scraper, turn_limit=ESCALATION_TURN_LIMIT),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                raise StageSkipped("scrape", f"computer-use escalation exceeded {timeout:.0f}s (blocked: {reason})")
+    brand_data["extraction"] = "computer_use"
+    brand_data["escalation_reason"] = reason
+    log("Computer-use agent extraction complete.")
+    return brand_data
+
+def complete_task(task_id: str, partial: bool = False):
+    # Drop logs and payload; sections are loaded on demand from data.json
+    tasks[task_id] = {"status": "completed", "progress": 100}
+    if partial:
+        tasks[task_id]["partial"] = True
+
+async def dump_trace(brand_id: str, trace: list):
+    try:
+        os.makedirs(f"results/{brand_id}", exist_ok=True)
+        async with aiofiles.open(f"results/{brand_id}/trace.json", "w") as f:
+            await f.write(json.dumps(trace, default=str, indent=2))
+    except Exception as e:
+        print(f"[{brand_id}] Could not write trace: {e}")
+
+async def reconcile_indexes():
+    # Results written before the indexes existed are picked up, folders removed by hand are dropped
+    for name, reconcile in (("similarity", lambda: palette_index.reconcile("results")), ("search", lambda: search_index.reconcile(store.version))):
+        try:
+            stats = await asyncio.to_thread(reconcile)
+            if any(stats.values()):
+                print(f"Reconciled {name} index: {stats}")
+        except Exception as e:
+            print(f"Could not reconcile {name} index: {e}")
+
+@app.middleware("http")
+async def measure_first_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    warmup.request_finished(f"{request.method} {getattr(route, 'path', request.url.path)}", time.perf_counter() - started)
+    return response
 
 @app.post("/analyze")
 async def analyze_brand(request: AnalysisRequest, background_tasks: BackgroundTasks):
@@ -162,29 +515,212 @@ async def analyze_brand(request: AnalysisRequest, background_tasks: BackgroundTa
     
     # If task allows concurrent same-brand processing, we might want to check if it's already running?
     # For now, we'll just overwrite/join.
-    if brand_id not in tasks:
-        tasks[brand_id] = {"status": "pending", "created_at": str(asyncio.get_event_loop().time())}
-        background_tasks.add_task(analyze_brand_task, brand_id, request.url)
+    if brand_id not in tasks and store.is_complete(brand_id):
+        complete_task(brand_id)
+    elif brand_id not in tasks:
+        tasks[brand_id] = {"status": "pending", "created_at": str(asyncio.get_event_loop().time()), "last_polled": time.monotonic()}
+        background_tasks.add_task(analyze_brand_task, brand_id, request.url, request.crawl, request.max_pages, request.screenshot, request.report_mode, request.variants, request.abandon_after)
     elif tasks[brand_id]["status"] == "completed":
-        # It's done, ensure data is loaded?
-        # The background task logic checks persistence, but tasks dict might be empty on restart.
-        # We should probably trigger the task to load from disk if needed.
-        # Let's just trigger the task again; the task logic handles "Found existing data".
-        if "data" not in tasks[brand_id]:
-             background_tasks.add_task(analyze_brand_task, brand_id, request.url)
+        # Results are served from disk; only re-run if they were deleted or are partial
+        if not store.is_complete(brand_id):
+             tasks[brand_id] = {"status": "pending", "last_polled": time.monotonic()}
+             background_tasks.add_task(analyze_brand_task, brand_id, request.url, request.crawl, request.max_pages, request.screenshot, request.report_mode, request.variants, request.abandon_after)
     else:
         # It's running/failed -> let it run or restart if failed?
         if tasks[brand_id].get("status") == "failed":
-             background_tasks.add_task(analyze_brand_task, brand_id, request.url)
+             background_tasks.add_task(analyze_brand_task, brand_id, request.url, request.crawl, request.max_pages, request.screenshot, request.report_mode, request.variants, request.abandon_after)
 
     return {"status": tasks[brand_id].get("status", "started"), "task_id": brand_id, "url": request.url}
 
 
 @app.get("/status/{task_id}")
 async def get_status(task_id: str):
-    if task_id not in tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return tasks[task_id]
+    task = tasks.get(task_id)
+    if task is None:
+        if not store.exists(task_id):
+            raise HTTPException(status_code=404, detail="Task not found")
+        task = {"status": "completed", "progress": 100}
+        if not store.is_complete(task_id):
+            task["partial"] = True
+    else:
+        # Polling keeps the job alive (see abandon_after)
+        task["last_polled"] = time.monotonic()
+    status = {"task_id": task_id, **{k: v for k, v in task.items() if k != "last_polled"}}
+    if task["status"] == "completed":
+        status["links"] = store.links(task_id)
+    return status
+
+@app.get("/jobs/{task_id}/{section}")
+async def get_job_section(task_id: str, section: str, request: Request):
+    if section not in SECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown section")
+    version = store.version(task_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+
+    etag = make_etag(version, section)
+    if request.headers.get("if-none-match"):
+        # Revalidation without touching data.json
+        response = cached_response(request, b"", "application/json", etag)
+        if response.status_code == 304:
+            return response
+
+    data = await store.load(task_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+    payload = store.section(task_id, data, section)
+    if isinstance(payload, str):
+        return cached_response(request, payload.encode("utf-8"), "text/markdown; charset=utf-8", etag)
+    return cached_response(request, json.dumps(payload, default=str).encode("utf-8"), "application/json", etag)
+
+@app.post("/jobs/{task_id}/cancel")
+async def cancel_job(task_id: str):
+    # Stops the running stage; the job still finishes with a partial result from what completed
+    budget = running_jobs.get(task_id)
+    if budget is None:
+        raise HTTPException(status_code=409, detail="Analysis is not running")
+    budget.cancel("cancelled by client")
+    return JSONResponse({"task_id": task_id, "status": "cancelling"}, status_code=202)
+
+@app.delete("/jobs/{task_id}")
+async def delete_job(task_id: str):
+    # Evicts a brand's results and its index entries; the next /analyze runs from scratch
+    if tasks.get(task_id, {}).get("status") in ("pending", "queued", "processing"):
+        raise HTTPException(status_code=409, detail="Analysis in progress")
+    if not store.exists(task_id) and task_id not in palette_index:
+        raise HTTPException(status_code=404, detail="Results not found")
+    await asyncio.to_thread(search_index.delete, task_id)
+    await asyncio.to_thread(palette_index.remove, task_id)
+    await asyncio.to_thread(store.delete, task_id)
+    tasks.pop(task_id, None)
+    return {"task_id": task_id, "status": "deleted"}
+
+@app.get("/results/bundle.zip")
+async def get_batch_bundle(brands: str, request: Request):
+    # Several brands in one archive, one folder each (e.g. a batch job's output)
+    brand_ids = list(dict.fromkeys(b.strip() for b in brands.split(",") if b.strip()))
+    if not brand_ids or len(brand_ids) > MAX_BUNDLE_BRANDS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_BUNDLE_BRANDS} brands")
+    return await bundle_response(request, brand_ids, "brands_bundle.zip")
+
+@app.get("/results/{brand_id}/bundle.zip")
+async def get_bundle(brand_id: str, request: Request):
+    return await bundle_response(request, [brand_id], f"{brand_id}_bundle.zip")
+
+async def bundle_response(request: Request, brand_ids: list, filename: str):
+    versions = []
+    for brand_id in brand_ids:
+        if tasks.get(brand_id, {}).get("status") in ("pending", "queued", "processing"):
+            raise HTTPException(status_code=409, detail=f"Analysis in progress: {brand_id}")
+        version = store.version(brand_id) if valid_brand_id(brand_id) else None
+        if version is None:
+            raise HTTPException(status_code=404, detail=f"Results not found: {brand_id}")
+        versions.append(version)
+
+    key = bundle_cache.key(brand_ids, versions)
+    path = bundle_cache.path(key)
+    if path is None and "range" in request.headers and bundle_cache.enabled:
+        # Resuming needs stable bytes on disk; finish the bundle into the cache first
+        path = await asyncio.to_thread(bundle_cache.build, key, bundle_files("results", brand_ids))
+    if path:
+        # Content-Length, ETag/If-Range and byte ranges come from FileResponse
+        return FileResponse(path, media_type="application/zip", filename=filename, headers={"Cache-Control": REVALIDATE})
+    # Built on the fly while it downloads: constant memory, no waiting for the archive to be assembled
+    files = await asyncio.to_thread(bundle_files, "results", brand_ids)
+    return StreamingResponse(
+        bundle_cache.stream(key, files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+@app.get("/search")
+async def search_results(
+    q: str,
+    fields: Optional[str] = None,
+    font: Optional[str] = None,
+    extraction: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if selected and any(f not in FIELDS for f in selected):
+        raise HTTPException(status_code=400, detail=f"fields must be among {FIELDS}")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    started = time.perf_counter()
+    results = await asyncio.to_thread(search_index.search, q, selected, font, extraction, min(max(limit, 1), 100), max(offset, 0))
+    return {
+        "query": q,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results,
+    }
+
+@app.get("/thumbs/{brand_id}/{path:path}")
+async def get_thumbnail(brand_id: str, path: str, w: int = 320, v: Optional[str] = None):
+    if w not in THUMBNAIL_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"Width must be one of {THUMBNAIL_WIDTHS}")
+    if not valid_brand_id(brand_id):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    brand_root = os.path.realpath(os.path.join("results", brand_id))
+    source = os.path.realpath(os.path.join(brand_root, path))
+    if not source.startswith(brand_root + os.sep) or not os.path.isfile(source):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    immutable = v is not None and v == await asyncio.to_thread(current_version, source)
+    headers = {"Cache-Control": IMMUTABLE if immutable else REVALIDATE}
+    if source.lower().endswith(".svg"):
+        # Vector art scales itself; serve as-is
+        return FileResponse(source, media_type="image/svg+xml", headers=headers)
+
+    dest = thumbnail_path("results", brand_id, path, w)
+    if not os.path.exists(dest) or os.path.getmtime(dest) < os.path.getmtime(source):
+        try:
+            await asyncio.to_thread(make_thumbnail, source, dest, w)
+        except Exception as e:
+            raise HTTPException(status_code=415, detail=f"Cannot thumbnail artifact: {e}")
+    return FileResponse(dest, media_type="image/webp", headers=headers)
+
+@app.get("/similar/{brand_id}")
+async def get_similar(brand_id: str, k: int = 10, palette_weight: float = 0.7):
+    if not 0 <= palette_weight <= 1:
+        raise HTTPException(status_code=400, detail="palette_weight must be between 0 and 1")
+    if brand_id not in palette_index:
+        data = await store.load(brand_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Results not found")
+        await asyncio.to_thread(palette_index.add, brand_id, data)
+    started = time.perf_counter()
+    matches = await asyncio.to_thread(palette_index.similar, brand_id, min(max(k, 1), 100), palette_weight)
+    return {
+        "brand_id": brand_id,
+        "indexed": len(palette_index),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "matches": matches,
+    }
+
+@app.get("/ready")
+async def get_ready():
+    # Readiness for load balancers / startup probes: 503 until warmup has finished
+    state = warmup.state()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503, headers={"Cache-Control": "no-store"})
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/trace/{task_id}")
+async def get_trace(task_id: str):
+    path = f"results/{task_id}/trace.json"
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Trace not found")
+    async with aiofiles.open(path, "r") as f:
+        return json.loads(await f.read())
+
+# Mount static directories last so routes under /results (bundle.zip) take precedence
+# Precompressed variants, immutable caching for ?v= content-hashed URLs, range requests
+app.mount("/results", ArtifactFiles(directory="results"), name="results")
+
+warmup.imported()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,145 @@
+import os
+import stat
+import uuid
+import gzip
+import hashlib
+import functools
+import mimetypes
+import anyio
+from typing import Dict, List, Optional
+from urllib.parse import quote, parse_qs
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from PIL import Image
+
+from services.http_cache import accepted_encodings, brotli
+
+# Text artifacts that get .gz/.br siblings at write time
+PRECOMPRESS_EXTENSIONS = (".css", ".json", ".txt", ".md", ".svg")
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+MIN_PRECOMPRESS_SIZE = 512
+
+# Allowed thumbnail widths; bounds the on-disk thumbnail cache
+THUMBNAIL_WIDTHS = (160, 320, 640)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=300"
+
+def precompress(path: str):
+    # Write path.gz (and path.br when brotli is installed) next to a text artifact.
+    # Cheap at write time, saves compressing on every request.
+    if not path.lower().endswith(PRECOMPRESS_EXTENSIONS):
+        return
+    try:
+        # Siblings from an earlier version of the file would be served ahead of it
+        for suffix in ENCODING_SUFFIX.values():
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < MIN_PRECOMPRESS_SIZE:
+            return
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=9))
+    except Exception as e:
+        print(f"Could not precompress {path}: {e}")
+
+def content_version(path: str) -> Optional[str]:
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=4096)
+def _stat_version(path: str, mtime_ns: int, size: int) -> Optional[str]:
+    return content_version(path)
+
+def current_version(path: str) -> Optional[str]:
+    # content_version memoized on (mtime, size), so validating ?v= doesn't rehash on every request
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _stat_version(path, st.st_mtime_ns, st.st_size)
+
+def immutable_for(path: str, query_string: str) -> bool:
+    # Only a ?v= that matches the file's current content may be cached forever
+    version = parse_qs(query_string).get("v", [None])[0]
+    return version is not None and version == current_version(path)
+
+def content_versions(base_dir: str, brand_id: str, relative_paths: List[str]) -> Dict[str, Optional[str]]:
+    # Hash each artifact once; blocking reads, so call it off the event loop
+    return {p: content_version(os.path.join(base_dir, brand_id, p)) for p in dict.fromkeys(relative_paths)}
+
+def versioned_url(base_dir: str, brand_id: str, relative_path: str, version: Optional[str]) -> str:
+    # Content-hashed URL; served with immutable caching because the bytes behind it never change
+    url = f"/{base_dir}/{brand_id}/{relative_path}"
+    return f"{url}?v={version}" if version else url
+
+class ArtifactFiles(StaticFiles):
+    # StaticFiles that prefers precompressed siblings and sets cache headers.
+    # Range requests (large PDFs/screenshots) are served from the original file by FileResponse.
+
+    async def get_response(self, path: str, scope) -> Response:
+        # Dot-entries (.index, .bundles, .thumbs, .partial) are internal, never served
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            raise HTTPException(status_code=404)
+        request_headers = Headers(scope=scope)
+        response = None
+        if "range" not in request_headers and path.lower().endswith(PRECOMPRESS_EXTENSIONS):
+            for encoding in accepted_encodings(request_headers):
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ENCODING_SUFFIX[encoding])
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    media_type = mimetypes.guess_type(path)[0] or "text/plain"
+                    response = FileResponse(
+                        full_path,
+                        stat_result=stat_result,
+                        media_type=media_type,
+                        headers={"Content-Encoding": encoding},
+                    )
+                    if self.is_not_modified(response.headers, request_headers):
+                        response = Response(status_code=304, headers={"ETag": response.headers["etag"]})
+                    break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 206, 304):
+            query = scope.get("query_string", b"").decode("latin-1")
+            full_path, _ = await anyio.to_thread.run_sync(self.lookup_path, path)
+            immutable = bool(full_path) and await anyio.to_thread.run_sync(immutable_for, full_path, query)
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+def thumbnail_path(base_dir: str, brand_id: str, relative_path: str, width: int) -> str:
+    name = hashlib.sha1(relative_path.encode()).hexdigest()[:16]
+    return os.path.join(base_dir, brand_id, ".thumbs", str(width), f"{name}.webp")
+
+def make_thumbnail(source: str, dest: str, width: int):
+    # Width-bound WebP; very tall full-page screenshots are cropped from the top
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(source) as img:
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.LANCZOS)
+        if height > width * 2:
+            img = img.crop((0, 0, width, width * 2))
+        # Unique per call: concurrent first requests for one thumbnail must not share a temp file
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        img.save(tmp, "WEBP", quality=80, method=4)
+    os.replace(tmp, dest)
+
+def thumbnail_url(brand_id: str, relative_path: str, width: int, version: Optional[str]) -> str:
+    # Versioned by the source's content hash so previews can be cached immutably too
+    url = f"/thumbs/{brand_id}/{quote(relative_path)}?w={width}"
+    return f"{url}&v={version}" if version else url
@@ -1,9 +1,15 @@
 import os
+import base64
+import asyncio
 import aiofiles
 import httpx
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from PIL import Image
 
+from services.metrics import span
+from services.artifacts import precompress
+from services import logo_ranker
+
 class AssetManager:
     def __init__(self, base_dir: str = "results"):
         self.base_dir = base_dir
@@ -17,31 +23,50 @@ class AssetManager:
 
     async def save_screenshot(self, task_id: str, screenshot_bytes: bytes, filename: str = "homepage.png"):
         path = os.path.join(self.base_dir, task_id, "Snapshot", filename)
-        async with aiofiles.open(path, "wb") as f:
-            await f.write(screenshot_bytes)
+        with span("assets.save_screenshot", bytes=len(screenshot_bytes)):
+            async with aiofiles.open(path, "wb") as f:
+                await f.write(screenshot_bytes)
         return path
 
-    async def save_assets(self, task_id: str, assets: List[Dict[str, str]]):
+    async def _fetch_asset(self, client: httpx.AsyncClient, asset: Dict[str, Any]) -> bytes:
+        if asset.get("content"):
+            return asset["content"].encode()
+        url = asset.get("url", "")
+        try:
+            if url.startswith("data:image/") and ";base64," in url:
+                return base64.b64decode(url.split(",", 1)[1])
+            if not url.startswith('http'):
+                return b""
+            response = await client.get(url, timeout=10)
+            if response.status_code == 200:
+                return response.content
+        except Exception as e:
+            print(f"Failed to download asset {url[:200]}: {e}")
+        return b""
+
+    async def save_assets(self, task_id: str, assets: List[Dict[str, Any]]):
+        # Only the best-placed candidates are fetched; duplicates are dropped after decoding
+        candidates = logo_ranker.preselect(assets)
+        with span("assets.download", count=len(candidates), candidates=len(assets)) as s:
+            async with httpx.AsyncClient(follow_redirects=True) as client:
+                contents = await asyncio.gather(*(self._fetch_asset(client, a) for a in candidates))
+            s.add("bytes", sum(len(c) for c in contents))
+
+        with span("assets.rank", count=len(candidates)) as s:
+            selected = await asyncio.to_thread(logo_ranker.select, list(zip(candidates, contents)))
+            s.set(kept=len(selected))
+
         paths = []
-        async with httpx.AsyncClient() as client:
-            for i, asset in enumerate(assets):
-                try:
-                    url = asset['url']
-                    if not url.startswith('http'): continue
-                    
-                    response = await client.get(url, timeout=10)
-                    if response.status_code == 200:
-                        ext = url.split('.')[-1].split('?')[0]
-                        if len(ext) > 4 or '/' in ext: ext = "png" # fallback
-                        
-                        filename = f"{asset['type']}_{i}.{ext}"
-                        path = os.path.join(self.base_dir, task_id, "Brand Assets", filename)
-                        
-                        async with aiofiles.open(path, "wb") as f:
-                            await f.write(response.content)
-                        paths.append(path)
-                except Exception as e:
-                    print(f"Failed to download asset {asset['url']}: {e}")
+        for i, (asset, data, ext) in enumerate(selected):
+            try:
+                filename = f"{logo_ranker.kind(asset)}_{i}.{ext}"
+                path = os.path.join(self.base_dir, task_id, "Brand Assets", filename)
+                async with aiofiles.open(path, "wb") as f:
+                    await f.write(data)
+                await asyncio.to_thread(precompress, path)
+                paths.append(path)
+            except Exception as e:
+                print(f"Failed to save asset {asset.get('url', asset.get('type'))}: {e}")
         return paths
 
     async def save_fonts(self, task_id: str, fonts: List[str]):
@@ -49,6 +74,7 @@ class AssetManager:
         async with aiofiles.open(path, "w") as f:
             for font in fonts:
                 await f.write(f"{font}\n")
+        await asyncio.to_thread(precompress, path)
 
     async def save_colors(self, task_id: str, colors: List[str]):
         # Save hex codes text
@@ -70,7 +96,8 @@ class AssetManager:
             except Exception:
                 pass
                 
-    def rgb_to_hex(self, rgb_str: str) -> str:
+    @staticmethod
+    def rgb_to_hex(rgb_str: str) -> str:
         # Simple regex to parse rgb(r, g, b) or rgba(r, g, b, a)
         import re
         match = re.search(r'rgba?\((\d+),\s*(\d+),\s*(\d+)(?:,\s*[\d\.]+)?\)', rgb_str)
@@ -105,24 +132,31 @@ class AssetManager:
         css_dir = os.path.join(self.base_dir, task_id, "CSS")
         os.makedirs(css_dir, exist_ok=True)
         
-        async with httpx.AsyncClient() as client:
-            for i, asset in enumerate(css_list):
-                try:
-                    if asset['type'] == 'external_css':
-                        url = asset['url']
-                        response = await client.get(url, timeout=10)
-                        if response.status_code == 200:
-                            filename = f"style_{i}.css"
-                            path = os.path.join(css_dir, filename)
+        with span("assets.save_css", count=len(css_list)) as s:
+            async with httpx.AsyncClient() as client:
+                async def save_one(i: int, asset: Dict[str, str]) -> Optional[str]:
+                    try:
+                        if asset['type'] == 'external_css':
+                            response = await client.get(asset['url'], timeout=10)
+                            if response.status_code != 200:
+                                return None
+                            path = os.path.join(css_dir, f"style_{i}.css")
                             async with aiofiles.open(path, "wb") as f:
                                 await f.write(response.content)
-                            paths.append(path)
-                    elif asset['type'] == 'inline_css':
-                        filename = f"inline_{i}.css"
-                        path = os.path.join(css_dir, filename)
-                        async with aiofiles.open(path, "w") as f:
-                            await f.write(asset['content'])
-                        paths.append(path)
-                except Exception as e:
-                    print(f"Failed to save CSS asset: {e}")
+                            s.add("bytes", len(response.content))
+                        elif asset['type'] == 'inline_css':
+                            path = os.path.join(css_dir, f"inline_{i}.css")
+                            async with aiofiles.open(path, "w") as f:
+                                await f.write(asset['content'])
+                        else:
+                            return None
+                        await asyncio.to_thread(precompress, path)
+                        return path
+                    except Exception as e:
+                        print(f"Failed to save CSS asset: {e}")
+                        return None
+
+                # Stylesheets download concurrently so a slow CDN doesn't stall the job serially
+                results = await asyncio.gather(*(save_one(i, asset) for i, asset in enumerate(css_list)))
+                paths = [p for p in results if p]
         return paths
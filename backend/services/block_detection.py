@@ -0,0 +1,36 @@
+# Markers of bot-protection interstitials and challenge pages (Cloudflare, Akamai, PerimeterX,
+# DataDome, Incapsula). Matched against the lower-cased HTML of small pages only: protected sites
+# also inject vendor scripts into normal pages, but real challenge pages are tiny.
+BLOCK_MARKERS = [
+    "cf-browser-verification", "cf-chl-", "attention required! | cloudflare",
+    "<title>just a moment...</title>", "px-captcha", "captcha-delivery.com",
+    "request unsuccessful. incapsula", "pardon our interruption",
+    "verify you are human", "are you a robot", "access denied</title>", "errors.edgesuite.net",
+]
+BLOCK_PAGE_MAX_SIZE = 50000
+
+BLOCK_STATUS_CODES = {401, 403, 429, 503}
+
+class BlockedPageError(Exception):
+    # The page is a bot wall or challenge rather than the site; callers may escalate
+    def __init__(self, reason: str):
+        super().__init__(f"Page blocked: {reason}")
+        self.reason = reason
+
+class PageLoadError(Exception):
+    # Navigation got no response at all (DNS failure, refused connection, bad URL); not worth escalating
+    pass
+
+def detect_block(content: str, status: int = None) -> str:
+    # Returns a reason string when the page looks blocked, else ""
+    if not content or len(content) < 500:
+        return f"Page failed to load any meaningful content. Length: {len(content or '')}"
+    if len(content) > BLOCK_PAGE_MAX_SIZE:
+        return ""
+    lowered = content.lower()
+    for marker in BLOCK_MARKERS:
+        if marker in lowered:
+            return f"challenge marker '{marker}'" + (f" (HTTP {status})" if status else "")
+    if status in BLOCK_STATUS_CODES:
+        return f"HTTP {status}"
+    return ""
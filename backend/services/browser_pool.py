@@ -0,0 +1,67 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+BROWSER_ARGS = [
+    "--no-sandbox", 
+    "--disable-setuid-sandbox", 
+    "--disable-dev-shm-usage",
+    "--disable-http2"
+]
+
+class BrowserPool:
+    # One long-lived Chromium per process; callers get cheap, isolated contexts from it
+    # instead of paying a full browser launch per task.
+
+    def __init__(self, headless: bool = True, max_contexts: int = None):
+        if max_contexts is None:
+            max_contexts = int(os.getenv("BROWSER_MAX_CONTEXTS", "8"))
+        self.headless = headless
+        self.max_contexts = max_contexts
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_contexts)
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        async with self._lock:
+            if self.started:
+                return self._browser
+            if self._playwright is None:
+                # Imported here so the API process can serve cached results before Playwright loads
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+            return self._browser
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        async with self._slots:
+            browser = await self.start()
+            context = await browser.new_context(**context_kwargs)
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"Failed to close browser context: {e}")
+
+    async def close(self):
+        async with self._lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+# Shared headless pool for the process
+browser_pool = BrowserPool()
@@ -0,0 +1,130 @@
+import io
+import os
+import time
+import uuid
+import hashlib
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+
+# Already-compressed formats go into the ZIP as-is; deflating them again costs CPU for no gain
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".woff", ".woff2", ".pdf", ".zip", ".gz", ".br")
+CHUNK_SIZE = 64 * 1024
+# Finished bundles kept for range/resume requests, newest first; 0 streams without writing anything
+BUNDLE_CACHE_MAX = int(os.getenv("BUNDLE_CACHE_MAX", "32"))
+STALE_PART_SECONDS = 3600
+
+class _Sink(io.RawIOBase):
+    # Non-seekable write target: zipfile switches to data descriptors and everything it writes
+    # is handed out in order by drain(), so the archive never exists in memory or on disk as a whole
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> List[bytes]:
+        chunks, self.chunks = self.chunks, []
+        return [b"".join(chunks)] if chunks else []
+
+def bundle_files(base_dir: str, brand_ids: List[str]) -> List[Tuple[str, str]]:
+    # (path, name in archive) for every artifact of the brands, read from the results tree at request time.
+    # Skips dot-entries (.thumbs, .partial), precompressed siblings and in-flight writes.
+    files = []
+    for brand_id in brand_ids:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(base_dir, brand_id)):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for name in sorted(filenames):
+                if name.startswith(".") or name.endswith((".gz", ".br", ".tmp")):
+                    continue
+                path = os.path.join(dirpath, name)
+                files.append((path, os.path.relpath(path, base_dir).replace(os.sep, "/")))
+    return files
+
+def stream_zip(files: List[Tuple[str, str]]) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for path, arcname in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(st.st_mtime, 315532800))[:6])
+            info.file_size = st.st_size
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_STORED if path.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, zf.open(info, "w") as dest:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dest.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+class BundleCache:
+    # Streamed bundles are teed into the cache as they go out; once complete, later requests
+    # (including Range/resume) are served from the finished file. The client never waits on that
+    # write, but it does put the archive on disk; BUNDLE_CACHE_MAX=0 turns it off (no range support).
+
+    def __init__(self, directory: str, max_entries: int = BUNDLE_CACHE_MAX):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, brand_ids: List[str], versions: List[str]) -> str:
+        # Changes whenever any brand's data.json is rewritten
+        return hashlib.sha256("|".join(f"{b}:{v}" for b, v in zip(brand_ids, versions)).encode()).hexdigest()[:24]
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.zip")
+
+    def path(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self._file(key)
+        return path if os.path.exists(path) else None
+
+    def stream(self, key: str, files: List[Tuple[str, str]]) -> Iterator[bytes]:
+        if not self.enabled:
+            yield from stream_zip(files)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        final = self._file(key)
+        part = f"{final}.{uuid.uuid4().hex}.part"
+        complete = False
+        try:
+            with open(part, "wb") as out:
+                for chunk in stream_zip(files):
+                    out.write(chunk)
+                    yield chunk
+            os.replace(part, final)
+            complete = True
+            self.prune()
+        finally:
+            # An aborted download leaves nothing behind
+            if not complete and os.path.exists(part):
+                os.remove(part)
+
+    def build(self, key: str, files: List[Tuple[str, str]]) -> str:
+        for _ in self.stream(key, files):
+            pass
+        return self._file(key)
+
+    def prune(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file()]
+        except OSError:
+            return
+        now = time.time()
+        bundles = sorted((e for e in entries if e.name.endswith(".zip")), key=lambda e: e.stat().st_mtime, reverse=True)
+        stale = bundles[self.max_entries:] + [e for e in entries if e.name.endswith(".part") and now - e.stat().st_mtime > STALE_PART_SECONDS]
+        for entry in stale:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
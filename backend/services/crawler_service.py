@@ -0,0 +1,284 @@
+import asyncio
+import heapq
+import httpx
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib.robotparser import RobotFileParser
+
+from services.scraper_service import ScraperService, USER_AGENT
+from services.metrics import span
+
+# Path/anchor keywords that usually lead to pages carrying real brand identity
+BRAND_KEYWORDS = {
+    "brand": 5, "guideline": 6, "identity": 5, "logo": 5, "press": 4, "media": 3,
+    "newsroom": 4, "about": 4, "design": 3, "style": 3, "company": 2, "story": 2,
+    "who-we-are": 3, "our-story": 3, "kit": 3, "assets": 3,
+}
+
+# Pages that never carry brand identity and are often expensive or stateful
+SKIP_KEYWORDS = [
+    "login", "signin", "sign-in", "signup", "register", "cart", "checkout", "account",
+    "privacy", "terms", "cookie", "legal", "search", "wishlist", "logout",
+]
+
+SKIP_EXTENSIONS = (
+    ".pdf", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".mp4", ".mp3",
+    ".css", ".js", ".xml", ".json", ".ico",
+)
+
+def _host(url: str) -> str:
+    hostname = urlparse(url).netloc.lower()
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+    return hostname
+
+def score_link(url: str, text: str = "") -> float:
+    parsed = urlparse(url)
+    path = parsed.path.lower()
+    haystack = f"{path} {text.lower()}"
+    if any(k in haystack for k in SKIP_KEYWORDS):
+        return -1
+    score = 0.0
+    for keyword, weight in BRAND_KEYWORDS.items():
+        if keyword in haystack:
+            score += weight
+    # Prefer shallow pages; sub-brand sections usually sit one or two levels deep
+    depth = len([seg for seg in path.split("/") if seg])
+    score -= 0.5 * max(depth - 1, 0)
+    if parsed.query:
+        score -= 2
+    return score
+
+def robots_allows(robots: Optional[RobotFileParser], url: str) -> bool:
+    # No (or unreadable) robots.txt allows everything
+    return robots is None or robots.can_fetch(USER_AGENT, url)
+
+# Bounded priority queue of same-origin URLs, highest score first
+class Frontier:
+    def __init__(self, root_url: str, max_size: int = 200):
+        self.host = _host(root_url)
+        self.max_size = max_size
+        self.seen = set()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = 0
+
+    def normalize(self, url: str, base: str) -> Optional[str]:
+        url, _ = urldefrag(urljoin(base, url))
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return None
+        if _host(url) != self.host:
+            return None
+        if parsed.path.lower().endswith(SKIP_EXTENSIONS):
+            return None
+        return url.rstrip("/") or url
+
+    def add(self, url: str, base: str, text: str = "") -> bool:
+        url = self.normalize(url, base)
+        if not url or url in self.seen:
+            return False
+        self.seen.add(url)
+        score = score_link(url, text)
+        if score < 0:
+            return False
+        self._counter += 1
+        heapq.heappush(self._heap, (-score, self._counter, url))
+        if len(self._heap) > self.max_size:
+            # Drop the lowest-ranked entry to keep the frontier bounded
+            self._heap.remove(max(self._heap))
+            heapq.heapify(self._heap)
+        return True
+
+    def pop(self) -> Optional[str]:
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
+
+class CrawlerService:
+    def __init__(
+        self,
+        scraper: ScraperService = None,
+        max_pages: int = 5,
+        concurrency: int = 4,
+        politeness_delay: float = 1.0,
+        time_budget: float = 120.0,
+        subpage_settle_time: float = 3.0,
+    ):
+        self.scraper = scraper or ScraperService()
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.politeness_delay = politeness_delay
+        self.time_budget = time_budget
+        self.subpage_settle_time = subpage_settle_time
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_last_fetch: Dict[str, float] = {}
+
+    async def _load_robots(self, url: str) -> Optional[RobotFileParser]:
+        parsed = urlparse(url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        try:
+            async with httpx.AsyncClient(follow_redirects=True, headers={"User-Agent": USER_AGENT}) as client:
+                response = await client.get(robots_url, timeout=10)
+            if response.status_code >= 400:
+                return None
+            robots = RobotFileParser(robots_url)
+            robots.parse(response.text.splitlines())
+            return robots
+        except Exception as e:
+            print(f"Could not fetch robots.txt from {robots_url}: {e}")
+            return None
+
+    async def _wait_politely(self, url: str, delay: float):
+        # Serialize navigation starts per host, spacing them by `delay` seconds.
+        # Rendering still overlaps across tabs; only request starts are spaced.
+        host = _host(url)
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        loop = asyncio.get_running_loop()
+        async with lock:
+            last = self._host_last_fetch.get(host)
+            if last is not None:
+                wait = last + delay - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._host_last_fetch[host] = loop.time()
+
+    async def crawl(self, url: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_budget
+
+        robots = await self._load_robots(url)
+        delay = self.politeness_delay
+        if robots and robots.crawl_delay(USER_AGENT):
+            delay = max(delay, float(robots.crawl_delay(USER_AGENT)))
+
+        frontier = Frontier(url)
+        frontier.seen.add(frontier.normalize(url, url) or url)
+
+        async with self.scraper.new_context() as context:
+            # Homepage first: it provides the screenshot and seeds the frontier
+            page = await context.new_page()
+            try:
+                await self._wait_politely(url, delay)
+                with span("crawler.page", url=url) as s:
+                    on_response = self.scraper.track_transfer(page, s)
+                    await self.scraper.load_page(page, url)
+                    page.remove_listener("response", on_response)
+                    home = await self.scraper.extract_page(page, url, screenshot=True)
+                    s.set(js_heap_bytes=await self.scraper.browser_memory(page))
+                for link in await self.scraper._extract_links(page):
+                    if robots_allows(robots, link["url"]):
+                        frontier.add(link["url"], url, link.get("text", ""))
+            finally:
+                await page.close()
+
+            results = [home]
+            visited = 1
+            in_flight = 0
+            frontier_changed = asyncio.Condition()
+
+            async def worker():
+                nonlocal visited, in_flight
+                page = await context.new_page()
+                try:
+                    while True:
+                        async with frontier_changed:
+                            # Wait while others may still discover links to crawl
+                            while not len(frontier) and in_flight:
+                                await frontier_changed.wait()
+                            if visited >= self.max_pages or not len(frontier):
+                                return
+                            target = frontier.pop()
+                            visited += 1
+                            in_flight += 1
+                        try:
+                            remaining = deadline - loop.time()
+                            if remaining <= self.subpage_settle_time:
+                                return
+                            await self._wait_politely(target, delay)
+                            with span("crawler.page", url=target) as s:
+                                # The worker's page is reused, so the listener must go even if loading fails
+                                on_response = self.scraper.track_transfer(page, s)
+                                try:
+                                    await self._load_subpage(page, target, remaining)
+                                finally:
+                                    page.remove_listener("response", on_response)
+                                data = await self.scraper.extract_page(page, target, screenshot=False)
+                                s.set(js_heap_bytes=await self.scraper.browser_memory(page))
+                                links = await self.scraper._extract_links(page)
+                            results.append(data)
+                            for link in links:
+                                if robots_allows(robots, link["url"]):
+                                    frontier.add(link["url"], target, link.get("text", ""))
+                        except Exception as e:
+                            print(f"Crawl of {target} failed: {e}")
+                        finally:
+                            async with frontier_changed:
+                                in_flight -= 1
+                                frontier_changed.notify_all()
+                finally:
+                    await page.close()
+
+            remaining = deadline - loop.time()
+            if self.max_pages > 1 and remaining > 0:
+                workers = [asyncio.create_task(worker()) for _ in range(max(1, self.concurrency))]
+                try:
+                    await asyncio.wait_for(asyncio.gather(*workers), timeout=remaining)
+                except asyncio.TimeoutError:
+                    print(f"Crawl time budget of {self.time_budget}s exhausted")
+
+            return self.merge(results)
+
+    async def _load_subpage(self, page, url: str, remaining: float):
+        # Sub-pages share the warmed context (cookies, cache), so they settle much faster
+        await page.goto(url, wait_until="domcontentloaded", timeout=min(30, remaining) * 1000)
+        try:
+            await page.wait_for_load_state("load", timeout=min(self.subpage_settle_time, remaining) * 1000)
+        except Exception:
+            pass
+
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Merge per-page extractions into one brand profile; the first entry is the homepage
+        home = results[0]
+        merged = dict(home)
+
+        seen_assets = set()
+        assets = []
+        for result in results:
+            for asset in result.get("assets", []):
+                key = asset.get("url") or asset.get("content")
+                if key and key not in seen_assets:
+                    seen_assets.add(key)
+                    assets.append(asset)
+        merged["assets"] = assets
+
+        fonts = []
+        for result in results:
+            for font in result.get("fonts", []):
+                if font not in fonts:
+                    fonts.append(font)
+        merged["fonts"] = fonts[:10]
+
+        # Colors arrive ranked per page; a color ranked high on many pages wins
+        color_scores = Counter()
+        for result in results:
+            page_colors = result.get("colors", [])
+            for rank, color in enumerate(page_colors):
+                color_scores[color] += len(page_colors) - rank
+        merged["colors"] = [c for c, _ in color_scores.most_common(10)]
+
+        seen_css = set()
+        css = []
+        for result in results:
+            for asset in result.get("css", []):
+                key = asset.get("url") or asset.get("content")
+                if key and key not in seen_css:
+                    seen_css.add(key)
+                    css.append(asset)
+        merged["css"] = css[:15]
+
+        merged["pages"] = [{"url": r["url"], "title": r.get("title")} for r in results]
+        return merged
@@ -0,0 +1,85 @@
+import time
+import asyncio
+from typing import Dict, List, Optional
+
+# Share of the job budget each stage may use, in pipeline order. A stage's slice is its share of
+# whatever is left, so time an earlier stage did not use rolls forward to the later ones.
+STAGE_SHARES = {"scrape": 0.45, "assets": 0.15, "guidelines": 0.2, "report": 0.2}
+
+class StageSkipped(Exception):
+    # A stage ran out of budget (or the job was cancelled) and was stopped; the job carries on
+    def __init__(self, stage: str, reason: str):
+        super().__init__(f"{stage} stopped: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+class JobBudget:
+    # Job-wide deadline with per-stage slices and cooperative cancellation. `finalize_reserve`
+    # seconds are kept back so a partial result and PDF can still be written when stages run out.
+
+    def __init__(self, total: float, finalize_reserve: float = 20.0, shares: Dict[str, float] = None):
+        self.total = total
+        self.finalize_reserve = finalize_reserve
+        self.shares = shares or STAGE_SHARES
+        self.started = time.monotonic()
+        self.deadline = self.started + total
+        self.cancel_reason: Optional[str] = None
+        self.incomplete: List[str] = []
+        self._cancelled = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        # Time left for stages, excluding the finalize reserve
+        return max(0.0, self.deadline - self.finalize_reserve - time.monotonic())
+
+    def slice(self, stage: str) -> float:
+        if self.cancelled:
+            return 0.0
+        stages = list(self.shares)
+        later = stages[stages.index(stage):]
+        return self.remaining() * self.shares[stage] / sum(self.shares[s] for s in later)
+
+    def cancel(self, reason: str):
+        if not self.cancelled:
+            self.cancel_reason = reason
+            self._cancelled.set()
+
+    def skipped(self, stage: str):
+        if stage not in self.incomplete:
+            self.incomplete.append(stage)
+
+    async def run(self, stage: str, coro, timeout: float = None):
+        # Runs one stage within its slice. On timeout or cancel the stage task is cancelled, which
+        # unwinds its browser contexts, HTTP requests and Gemini calls, and StageSkipped is raised.
+        timeout = self.slice(stage) if timeout is None else min(timeout, self.slice(stage))
+        if timeout <= 0:
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            else:
+                coro.cancel()
+            self.skipped(stage)
+            raise StageSkipped(stage, self.cancel_reason or "deadline")
+        task = asyncio.ensure_future(coro)
+        waiter = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            done, _ = await asyncio.wait({task, waiter}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            waiter.cancel()
+        if task in done:
+            return task.result()
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self.skipped(stage)
+        raise StageSkipped(stage, self.cancel_reason or f"deadline ({timeout:.1f}s slice)")
@@ -2,27 +2,166 @@ import os
 import asyncio
 import base64
 from typing import List, Dict, Any, Tuple
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+from playwright.async_api import Page
 from playwright_stealth import Stealth
-from google import genai
 from google.genai import types
 from google.genai.types import Content, Part
+import io
+import re
+import json
 import time
+from PIL import Image
+
+from services.metrics import span, record_usage
+from services.gemini_service import get_client
+from services.browser_pool import BrowserPool, browser_pool
+from services.scraper_service import ScraperService, USER_AGENT, EXTRA_HTTP_HEADERS
+from services.block_detection import BlockedPageError, detect_block
+
+# Placeholder for screenshots that fell out of the history window
+OMITTED_SCREENSHOT = "[Earlier screenshot omitted to bound request size; see the latest screenshot.]"
+
+class ScreenshotHistory:
+    # Keeps the last `keep_full` screenshots in `contents` at full resolution and degrades older
+    # ones in place, either to a text placeholder or to a small JPEG thumbnail. Without this every
+    # generate_content call re-uploads every screenshot taken so far.
+
+    def __init__(self, keep_full: int = 3, mode: str = "text", thumbnail_width: int = 320):
+        self.keep_full = keep_full
+        self.mode = mode
+        self.thumbnail_width = thumbnail_width
+        self._degraded = set()
+
+    def _thumbnail(self, data: bytes) -> bytes:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB")
+            height = max(1, round(img.height * self.thumbnail_width / img.width))
+            img = img.resize((self.thumbnail_width, height))
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=50)
+            return out.getvalue()
+
+    def _images(self, contents: List[Content]):
+        # Newest first: every Part or FunctionResponsePart that carries an image blob
+        for content in reversed(contents):
+            for part in reversed(content.parts or []):
+                if part.inline_data and (part.inline_data.mime_type or "").startswith("image/"):
+                    yield part
+                elif part.function_response and part.function_response.parts:
+                    for fr_part in reversed(part.function_response.parts):
+                        if fr_part.inline_data:
+                            yield fr_part
+
+    def compact(self, contents: List[Content]):
+        for index, holder in enumerate(self._images(contents)):
+            if index < self.keep_full or id(holder) in self._degraded:
+                continue
+            if self.mode == "thumbnail":
+                holder.inline_data.data = self._thumbnail(holder.inline_data.data)
+                holder.inline_data.mime_type = "image/jpeg"
+            elif isinstance(holder, Part):
+                holder.inline_data = None
+                holder.text = OMITTED_SCREENSHOT
+            else:
+                holder.inline_data = None
+            self._degraded.add(id(holder))
+        self._drop_empty_response_parts(contents)
+
+    def _drop_empty_response_parts(self, contents: List[Content]):
+        for content in contents:
+            for part in content.parts or []:
+                fr = part.function_response
+                if fr and fr.parts and all(p.inline_data is None for p in fr.parts):
+                    fr.parts = None
+                    fr.response = {**(fr.response or {}), "screenshot": OMITTED_SCREENSHOT}
+
+    @staticmethod
+    def payload_bytes(contents: List[Content]) -> int:
+        total = 0
+        for content in contents:
+            for part in content.parts or []:
+                if part.text:
+                    total += len(part.text.encode("utf-8"))
+                if part.inline_data and part.inline_data.data:
+                    total += len(part.inline_data.data)
+                if part.function_response:
+                    total += len(str(part.function_response.response or {}))
+                    for fr_part in part.function_response.parts or []:
+                        if fr_part.inline_data and fr_part.inline_data.data:
+                            total += len(fr_part.inline_data.data)
+        return total
+
+BRAND_AUDIT_PROMPT = """You are auditing the visual brand identity of {url}.
+If a cookie banner, bot check or challenge page is shown, get past it the way a normal visitor would.
+Once the real site is visible, look at the header, logo, navigation, buttons and footer.
+When done, reply with only a JSON object and nothing else:
+{{"title": "...", "description": "...", "colors": ["#rrggbb", ...], "fonts": ["..."], "logo_urls": ["..."]}}
+"""
+
+def parse_findings(answer: str) -> Dict[str, Any]:
+    # The agent's final answer should be a JSON object, possibly wrapped in a code fence
+    match = re.search(r"\{.*\}", answer or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        findings = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    return findings if isinstance(findings, dict) else {}
+
+def merge_findings(brand_data: Dict[str, Any], findings: Dict[str, Any]) -> Dict[str, Any]:
+    # Agent observations go first; DOM extraction fills in the rest, keeping the brand_data shape
+    if findings.get("title") and (not brand_data.get("title") or brand_data["title"] == brand_data.get("url")):
+        brand_data["title"] = findings["title"]
+    if findings.get("description") and not brand_data.get("description"):
+        brand_data["description"] = findings["description"]
+    for key in ("colors", "fonts"):
+        merged = [v for v in findings.get(key, []) if isinstance(v, str)]
+        merged += [v for v in brand_data.get(key, []) if v not in merged]
+        brand_data[key] = merged[:10]
+    known = {a.get("url") for a in brand_data.get("assets", [])}
+    for logo in findings.get("logo_urls", []):
+        if isinstance(logo, str) and logo.startswith("http") and logo not in known:
+            brand_data.setdefault("assets", []).append({"type": "logo", "url": logo})
+    return brand_data
 
 class GeminiComputerUseService:
-    def __init__(self):
+    def __init__(
+        self,
+        keep_screenshots: int = 3,
+        screenshot_format: str = "jpeg",
+        screenshot_quality: int = 80,
+        old_screenshot_mode: str = "text",
+        headless: bool = True,
+        pool: BrowserPool = None,
+    ):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
         self.location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-        self.client = genai.Client(
-            vertexai=True,
-            project=self.project_id,
-            location=self.location
-        )
+        # Shared client, resolved in _run_agent off the event loop
+        self.client = None
         # Use gemini-2.5-flash as default as requested
         self.model_id = 'gemini-2.5-flash'
         # Original preview model from docs: 'gemini-2.5-computer-use-preview-10-2025'
         self.screen_width = 1440
         self.screen_height = 900
+        # "png", "jpeg" or "webp"; JPEG/WebP are several times smaller than PNG for page captures
+        self.screenshot_format = screenshot_format
+        self.screenshot_quality = screenshot_quality
+        self.keep_screenshots = keep_screenshots
+        self.old_screenshot_mode = old_screenshot_mode
+        # Shared headless Chromium; a headed (debugging) run gets its own pool
+        self.pool = pool or (browser_pool if headless else BrowserPool(headless=False, max_contexts=1))
+
+    async def _capture_screenshot(self, page: Page) -> Tuple[bytes, str]:
+        if self.screenshot_format == "jpeg":
+            return await page.screenshot(type="jpeg", quality=self.screenshot_quality), "image/jpeg"
+        png = await page.screenshot(type="png")
+        if self.screenshot_format == "webp":
+            with Image.open(io.BytesIO(png)) as img:
+                out = io.BytesIO()
+                img.convert("RGB").save(out, "WEBP", quality=self.screenshot_quality)
+                return out.getvalue(), "image/webp"
+        return png, "image/png"
 
     def _denormalize_x(self, x: int) -> int:
         return int(x / 1000 * self.screen_width)
@@ -30,6 +169,45 @@ class GeminiComputerUseService:
     def _denormalize_y(self, y: int) -> int:
         return int(y / 1000 * self.screen_height)
 
+    # Resolves once the DOM has had no mutations for `quiet` ms (or after `limit` ms)
+    DOM_QUIET_JS = """([quiet, limit]) => new Promise(resolve => {
+        let timer;
+        const done = () => { observer.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(); };
+        const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, quiet); });
+        observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        timer = setTimeout(done, quiet);
+        const cap = setTimeout(done, limit);
+    })"""
+
+    # Which settle signal each action needs
+    SETTLE_KIND = {
+        "navigate": "navigation",
+        "click_at": "interaction",
+        "type_text_at": "interaction",
+        "key_combination": "interaction",
+        "scroll_document": "scroll",
+    }
+
+    async def _wait_dom_quiet(self, page: Page, quiet: int, limit: int):
+        await page.evaluate(self.DOM_QUIET_JS, [quiet, limit])
+
+    async def _settle(self, page: Page, kind: str, url_before: str):
+        if kind == "navigation":
+            await page.wait_for_load_state("domcontentloaded", timeout=10000)
+            await self._wait_dom_quiet(page, 300, 3000)
+        elif kind == "interaction":
+            try:
+                await self._wait_dom_quiet(page, 150, 2000)
+            except Exception:
+                # Execution context destroyed: the click/enter started a navigation
+                pass
+            if page.url != url_before:
+                await self._settle(page, "navigation", page.url)
+        elif kind == "scroll":
+            # Let the scroll paint and lazy-loaded content attach
+            await page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+            await self._wait_dom_quiet(page, 100, 1000)
+
     async def _execute_function_calls(self, candidate, page: Page) -> List[Tuple[str, Dict[str, Any]]]:
         results = []
         function_calls = []
@@ -42,12 +220,13 @@ class GeminiComputerUseService:
             args = function_call.args
             print(f"  -> Executing: {fname} with args: {args}")
             action_result = {}
+            url_before = page.url
 
             try:
                 if fname == "open_web_browser":
                     pass # Handled by the loop if needed, but usually already open
                 elif fname == "navigate":
-                    await page.goto(args["url"], wait_until="networkidle")
+                    await page.goto(args["url"], wait_until="commit", timeout=30000)
                 elif fname == "click_at":
                     actual_x = self._denormalize_x(args["x"])
                     actual_y = self._denormalize_y(args["y"])
@@ -82,8 +261,9 @@ class GeminiComputerUseService:
                     print(f"Warning: Unimplemented function {fname}")
                     action_result = {"error": f"Function {fname} is not implemented"}
 
-                await page.wait_for_load_state("load", timeout=10000)
-                await asyncio.sleep(1) # Small buffer
+                kind = self.SETTLE_KIND.get(fname)
+                if kind:
+                    await self._settle(page, kind, url_before)
 
             except Exception as e:
                 print(f"Error executing {fname}: {e}")
@@ -94,93 +274,143 @@ class GeminiComputerUseService:
         return results
 
     async def _get_function_responses(self, page: Page, results: List[Tuple[str, Dict[str, Any]]]) -> List[types.FunctionResponse]:
-        screenshot_bytes = await page.screenshot(type="png")
+        # One capture per turn: it reflects the state after all actions, so it is attached to the
+        # last response and the others point at it instead of carrying identical bytes.
+        screenshot_bytes, mime_type = await self._capture_screenshot(page)
         current_url = page.url
         function_responses = []
-        for name, result in results:
+        for index, (name, result) in enumerate(results):
             response_data = {"url": current_url}
             response_data.update(result)
+            parts = None
+            if index == len(results) - 1:
+                parts = [types.FunctionResponsePart(
+                        inline_data=types.FunctionResponseBlob(
+                            mime_type=mime_type,
+                            data=screenshot_bytes))
+                ]
+            else:
+                response_data["screenshot"] = f"See the screenshot attached to the {results[-1][0]} response of this turn."
             function_responses.append(
                 types.FunctionResponse(
                     name=name,
                     response=response_data,
-                    parts=[types.FunctionResponsePart(
-                            inline_data=types.FunctionResponseBlob(
-                                mime_type="image/png",
-                                data=screenshot_bytes))
-                    ]
+                    parts=parts
                 )
             )
         return function_responses
 
     async def execute_task(self, prompt: str, start_url: str = None, turn_limit: int = 10):
-        async with async_playwright() as p:
-            print("Initializing browser...")
-            browser = await p.chromium.launch(headless=False) # Headless=False for debugging
-            context = await browser.new_context(viewport={"width": self.screen_width, "height": self.screen_height})
+        print("Acquiring browser context...")
+        async with self.pool.context(viewport={"width": self.screen_width, "height": self.screen_height}) as context:
+            page = await context.new_page()
+            try:
+                return await self._run_agent(page, prompt, start_url, turn_limit)
+            finally:
+                await page.close()
+
+    async def extract_brand_data(self, url: str, scraper: ScraperService, turn_limit: int = 8) -> Dict[str, Any]:
+        # Escalation path for bot-protected sites: let the agent get past the wall, then run the
+        # scraper's normal DOM extraction on the page it reached and merge the agent's findings.
+        async with self.pool.context(
+            viewport={"width": self.screen_width, "height": self.screen_height},
+            user_agent=USER_AGENT,
+            extra_http_headers=EXTRA_HTTP_HEADERS,
+            ignore_https_errors=True,
+        ) as context:
             page = await context.new_page()
-            await Stealth().apply_stealth_async(page)
+            try:
+                answer = await self._run_agent(page, BRAND_AUDIT_PROMPT.format(url=url), url, turn_limit)
+                findings = parse_findings(answer)
+
+                content = ""
+                try:
+                    content = await page.content()
+                except Exception as e:
+                    print(f"Could not read agent page content: {e}")
+                reason = detect_block(content)
+                if reason and not findings:
+                    raise BlockedPageError(f"still blocked after escalation: {reason}")
+
+                if reason:
+                    # Only the agent's own observations are usable
+                    brand_data = {
+                        "url": url, "title": url, "description": "",
+                        "assets": [], "fonts": [], "colors": [], "css": [],
+                        "screenshot": await page.screenshot(full_page=True),
+                    }
+                else:
+                    brand_data = await scraper.extract_page(page, url, screenshot=True)
+                return merge_findings(brand_data, findings)
+            finally:
+                await page.close()
 
+    async def _run_agent(self, page: Page, prompt: str, start_url: str = None, turn_limit: int = 10) -> str:
+        if self.client is None:
+            self.client = await asyncio.to_thread(get_client)
+        await Stealth().apply_stealth_async(page)
+        if start_url:
             try:
-                if start_url:
-                    try:
-                        await page.goto(start_url, wait_until="commit", timeout=45000)
-                    except Exception as e:
-                        print(f"Initial navigation timeout/warning: {e}")
-                    await asyncio.sleep(15) # Wait for content to render on heavy sites like Myntra
+                await page.goto(start_url, wait_until="commit", timeout=45000)
+                # Heavy sites like Myntra keep rendering after DOMContentLoaded; wait for the DOM to go quiet
+                await page.wait_for_load_state("domcontentloaded", timeout=15000)
+                await self._wait_dom_quiet(page, 500, 8000)
+            except Exception as e:
+                print(f"Initial navigation timeout/warning: {e}")
                 
-                initial_screenshot = await page.screenshot(type="png")
+        initial_screenshot, mime_type = await self._capture_screenshot(page)
                 
-                contents = [
-                    Content(role="user", parts=[
-                        Part(text=prompt),
-                        Part.from_bytes(data=initial_screenshot, mime_type='image/png')
-                    ])
-                ]
+        contents = [
+            Content(role="user", parts=[
+                Part(text=prompt),
+                Part.from_bytes(data=initial_screenshot, mime_type=mime_type)
+            ])
+        ]
+        history = ScreenshotHistory(self.keep_screenshots, self.old_screenshot_mode)
 
-                config = types.GenerateContentConfig(
-                    tools=[types.Tool(computer_use=types.ComputerUse(
-                        environment=types.Environment.ENVIRONMENT_BROWSER
-                    ))],
-                    thinking_config=types.ThinkingConfig(include_thoughts=True),
-                )
+        config = types.GenerateContentConfig(
+            tools=[types.Tool(computer_use=types.ComputerUse(
+                environment=types.Environment.ENVIRONMENT_BROWSER
+            ))],
+            thinking_config=types.ThinkingConfig(include_thoughts=True),
+        )
 
-                for i in range(turn_limit):
-                    print(f"\n--- Turn {i+1} ---")
-                    print("Thinking...")
+        for i in range(turn_limit):
+            print(f"\n--- Turn {i+1} ---")
+            history.compact(contents)
+            payload = history.payload_bytes(contents)
+            print(f"Thinking... (request payload {payload / 1024:.0f} KB)")
                     
-                    response = await self.client.aio.models.generate_content(
-                        model=self.model_id,
-                        contents=contents,
-                        config=config,
-                    )
-
-                    candidate = response.candidates[0]
-                    contents.append(candidate.content)
+            with span("computer_use.turn", turn=i + 1, bytes=payload) as s:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_id,
+                    contents=contents,
+                    config=config,
+                )
+                record_usage(s, response)
 
-                    # Print thoughts if available
-                    if candidate.content.parts[0].thought:
-                        print(f"Agent Thoughts: {candidate.content.parts[0].text}")
+            candidate = response.candidates[0]
+            contents.append(candidate.content)
 
-                    has_function_calls = any(part.function_call for part in candidate.content.parts)
-                    if not has_function_calls:
-                        text_response = " ".join([part.text for part in candidate.content.parts if part.text])
-                        print(f"Agent finished: {text_response}")
-                        return text_response
+            # Print thoughts if available
+            if candidate.content.parts[0].thought:
+                print(f"Agent Thoughts: {candidate.content.parts[0].text}")
 
-                    print("Executing actions...")
-                    results = await self._execute_function_calls(candidate, page)
+            has_function_calls = any(part.function_call for part in candidate.content.parts)
+            if not has_function_calls:
+                text_response = " ".join([part.text for part in candidate.content.parts if part.text])
+                print(f"Agent finished: {text_response}")
+                return text_response
 
-                    print("Capturing state...")
-                    function_responses = await self._get_function_responses(page, results)
+            print("Executing actions...")
+            results = await self._execute_function_calls(candidate, page)
 
-                    contents.append(
-                        Content(role="user", parts=[Part(function_response=fr) for fr in function_responses])
-                    )
+            print("Capturing state...")
+            function_responses = await self._get_function_responses(page, results)
 
-                print("Reached turn limit.")
-                return "Reached turn limit without completion."
+            contents.append(
+                Content(role="user", parts=[Part(function_response=fr) for fr in function_responses])
+            )
 
-            finally:
-                print("\nClosing browser...")
-                await browser.close()
+        print("Reached turn limit.")
+        return "Reached turn limit without completion."
@@ -1,27 +1,52 @@
 import os
-from google import genai
-from google.genai import types
-from typing import Dict, Any
+import asyncio
+import threading
+from typing import Dict, Any, List
+
+from services.metrics import span, record_usage
+from services.report_schema import BrandReport, schema_json, parse_report
+
+# Pass the report schema as response_json_schema alongside the search tool (needs a model that
+# supports both at once); otherwise the schema goes in the prompt and the reply is validated locally
+NATIVE_SCHEMA = os.getenv("GEMINI_NATIVE_SCHEMA", "0") == "1"
+
+# One google-genai client per process, built on first use or during startup warmup.
+# google-genai is imported lazily; it is one of the slowest imports in the app.
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+            _client = genai.Client(
+                vertexai=True,
+                project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+                location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+            )
+        return _client
 
 class GeminiService:
-    def __init__(self):
+    def __init__(self, client=None):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
         self.location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-        
-        try:
-            # Using google-genai SDK
-            self.client = genai.Client(
-                vertexai=True,
-                project=self.project_id,
-                location=self.location
-            )
-            self.model_id = "gemini-2.5-flash"
-        except Exception as e:
-            print(f"GenAI Client Init failed: {e}")
-            self.client = None
+        self.model_id = "gemini-2.5-flash"
+
+        # Injected client (e.g. the offline benchmark's fake); otherwise the shared client is
+        # resolved on first use, in a worker thread so a cold import never stalls the event loop
+        self.client = client
+
+    async def ensure_client(self):
+        if self.client is None:
+            try:
+                self.client = await asyncio.to_thread(get_client)
+            except Exception as e:
+                print(f"GenAI Client Init failed: {e}")
+        return self.client
 
     async def search_brand_guidelines(self, brand_name: str, url: str) -> str:
-        if not self.client:
+        if not await self.ensure_client():
             return "GenAI Client not initialized."
 
         prompt = f"""
@@ -38,19 +63,22 @@ class GeminiService:
         try:
             # google-genai uses a sync client by default or we can use async?
             # Actually google-genai has an async client too: client.aio.models...
-            response = await self.client.aio.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    tools=[types.Tool(google_search=types.GoogleSearch())]
+            from google.genai import types
+            with span("gemini.search_brand_guidelines", model=self.model_id) as s:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_id,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        tools=[types.Tool(google_search=types.GoogleSearch())]
+                    )
                 )
-            )
+                record_usage(s, response)
             return response.text
         except Exception as e:
             return f"Error searching brand guidelines: {str(e)}"
 
     async def compile_final_report(self, brand_data: Dict[str, Any], guidelines_text: str) -> str:
-        if not self.client:
+        if not await self.ensure_client():
             return "GenAI Client not initialized."
 
         prompt = f"""
@@ -74,11 +102,71 @@ class GeminiService:
         """
         
         try:
-            response = await self.client.aio.models.generate_content(
-                model=self.model_id,
-                contents=prompt
-            )
+            with span("gemini.compile_final_report", model=self.model_id) as s:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_id,
+                    contents=prompt
+                )
+                record_usage(s, response)
             return response.text
         except Exception as e:
             return f"Error generating report: {str(e)}"
 
+
+    async def generate_structured_report(self, brand_data: Dict[str, Any], url: str):
+        # One grounded call that researches the guidelines and writes the report as a BrandReport,
+        # replacing search_brand_guidelines + compile_final_report. Returns None if unusable.
+        if not await self.ensure_client():
+            return None
+
+        prompt = f"""
+        Research the official brand guidelines for {brand_data.get('title', 'the brand')} ({url}) and
+        write a Brand Identity Report.
+
+        Website Data:
+        - Description: {brand_data.get('description')}
+        - Extracted Colors: {brand_data.get('colors', [])[:24]}
+        - Extracted Fonts: {brand_data.get('fonts', [])[:12]}
+
+        Assign each brand color a role and each font a typography role; prefer hex codes and families
+        from the official guidelines, otherwise from the extracted data. List logo usage rules as do/dont,
+        describe the brand voice, and add a Recommendations section.
+
+        Return a single JSON object matching this JSON schema, with no other text:
+        {schema_json()}
+        """
+
+        try:
+            from google.genai import types
+            config = types.GenerateContentConfig(tools=[types.Tool(google_search=types.GoogleSearch())])
+            if NATIVE_SCHEMA:
+                # Models that support controlled generation together with tools enforce the schema server-side
+                config.response_mime_type = "application/json"
+                config.response_json_schema = BrandReport.model_json_schema()
+            with span("gemini.structured_report", model=self.model_id) as s:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_id,
+                    contents=prompt,
+                    config=config,
+                )
+                record_usage(s, response)
+                report = parse_report(response.text)
+                s.set(valid=report is not None)
+            if report:
+                report.sources = grounding_sources(response)
+            return report
+        except Exception as e:
+            print(f"Error generating structured report: {e}")
+            return None
+
+def grounding_sources(response) -> List[str]:
+    sources, seen = [], set()
+    for candidate in getattr(response, "candidates", None) or []:
+        metadata = getattr(candidate, "grounding_metadata", None)
+        for chunk in getattr(metadata, "grounding_chunks", None) or []:
+            web = getattr(chunk, "web", None)
+            uri = getattr(web, "uri", None)
+            if uri and uri not in seen:
+                seen.add(uri)
+                sources.append(f"{web.title}: {uri}" if getattr(web, "title", None) else uri)
+    return sources[:10]
@@ -0,0 +1,68 @@
+import gzip
+from typing import List
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth the compression overhead
+MIN_COMPRESS_SIZE = 512
+
+def make_etag(version: str, part: str = "") -> str:
+    return f'W/"{version}-{part}"' if part else f'W/"{version}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison: W/"x" matches "x"
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+def accepted_encodings(headers) -> List[str]:
+    # Encodings we can produce that the client accepts, preferred first
+    header = headers.get("accept-encoding", "")
+    offered = {}
+    for item in header.split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            if param.strip().startswith("q="):
+                try:
+                    q = float(param.strip()[2:])
+                except ValueError:
+                    q = 0.0
+        if name:
+            offered[name] = q
+    encodings = []
+    if brotli is not None and offered.get("br", 0) > 0:
+        encodings.append("br")
+    if offered.get("gzip", 0) > 0:
+        encodings.append("gzip")
+    return encodings
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    media_type: str,
+    etag: str,
+    cache_control: str = "public, max-age=60, must-revalidate",
+) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    encodings = accepted_encodings(request.headers) if len(body) >= MIN_COMPRESS_SIZE else []
+    if encodings:
+        encoding = encodings[0]
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
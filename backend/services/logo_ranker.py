@@ -0,0 +1,192 @@
+import io
+import os
+import re
+import hashlib
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+from PIL import Image
+
+# Kept per kind ("logo" covers inline SVGs too, "favicon")
+MAX_PER_TYPE = int(os.getenv("LOGO_MAX_PER_TYPE", "3"))
+# Only this many candidates per kind are downloaded; the rest are ranked out up front
+DOWNLOAD_FACTOR = 2
+
+HASH_SIZE = 32
+LOW_FREQ = 8
+# Hamming distance (of 64 bits) at or under which two images are the same mark
+DUPLICATE_DISTANCE = 10
+# Formats the PDF and browsers handle directly; anything else (ICO, BMP, WebP...) is re-encoded to PNG
+KEEP_FORMATS = {"PNG": "png", "JPEG": "jpg", "GIF": "gif"}
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+DCT = _dct_matrix(HASH_SIZE)
+
+def kind(asset: Dict[str, Any]) -> str:
+    return "favicon" if asset.get("type") == "favicon" else "logo"
+
+def _declared_size(sizes: str) -> int:
+    numbers = [int(n) for n in re.findall(r"(\d+)x\d+", sizes or "")]
+    return max(numbers) if numbers else 0
+
+def dom_score(asset: Dict[str, Any]) -> float:
+    # Heuristic from what the page tells us before anything is downloaded
+    score = 0.0
+    if asset.get("type") == "favicon":
+        score += min(_declared_size(asset.get("sizes", "")), 512) / 128
+        rel = asset.get("rel", "").lower()
+        if "apple-touch-icon" in rel:
+            score += 1
+        if "any" in asset.get("sizes", "").lower() or asset.get("url", "").lower().split("?")[0].endswith(".svg"):
+            score += 2
+        return score
+
+    if asset.get("logo_hint", True):
+        score += 1
+    if asset.get("in_header"):
+        score += 3
+    if asset.get("links_home"):
+        score += 2
+    if asset.get("type") == "logo_svg":
+        score += 1
+    if asset.get("visible") is False:
+        score -= 4
+    bbox = asset.get("bbox")
+    if bbox:
+        width, height = bbox.get("width", 0), bbox.get("height", 0)
+        if width * height == 0:
+            score -= 4
+        else:
+            if 0.5 <= width / height <= 8:
+                score += 1
+            if width * height > 400 * 400:
+                score -= 2  # hero images mentioning "logo" somewhere
+        if bbox.get("y", 0) < 200:
+            score += 2
+        elif bbox.get("y", 0) < 800:
+            score += 0.5
+        if bbox.get("x", 0) < 400:
+            score += 0.5
+    return score
+
+def preselect(assets: List[Dict[str, Any]], max_per_type: int = MAX_PER_TYPE) -> List[Dict[str, Any]]:
+    # Best-first, bounded per kind; exact duplicates (same URL or same inline SVG) dropped
+    seen = set()
+    counts: Dict[str, int] = {}
+    selected = []
+    for asset in sorted(assets, key=dom_score, reverse=True):
+        key = asset.get("url") or _svg_key(asset.get("content", "").encode())
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        k = kind(asset)
+        if counts.get(k, 0) >= max_per_type * DOWNLOAD_FACTOR:
+            continue
+        counts[k] = counts.get(k, 0) + 1
+        selected.append(asset)
+    return selected
+
+def _svg_key(data: bytes) -> str:
+    return hashlib.sha1(re.sub(rb"\s+", b" ", data).strip()).hexdigest() if data else ""
+
+def is_svg(data: bytes) -> bool:
+    head = data[:1024].lstrip().lower()
+    return head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head)
+
+def _flatten(img: Image.Image) -> Image.Image:
+    # Transparent logos hash against white, the way they appear on most pages
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    return img.convert("L")
+
+def perceptual_hashes(images: List[Image.Image]) -> np.ndarray:
+    # DCT pHash for the whole batch at once: (N, 32, 32) pixels -> (N, 64) bits
+    pixels = np.stack([
+        np.asarray(_flatten(img).resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS), dtype=np.float32)
+        for img in images
+    ])
+    coeffs = DCT @ pixels @ DCT.T
+    low = coeffs[:, :LOW_FREQ, :LOW_FREQ].reshape(len(images), -1)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return low > median
+
+def duplicate_matrix(hashes: np.ndarray, threshold: int = DUPLICATE_DISTANCE) -> np.ndarray:
+    distances = np.count_nonzero(hashes[:, None, :] != hashes[None, :, :], axis=-1)
+    return distances <= threshold
+
+def _decode(data: bytes) -> Optional[Image.Image]:
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img
+    except Exception:
+        return None
+
+def _encode(img: Image.Image, data: bytes) -> Tuple[bytes, str]:
+    if img.format in KEEP_FORMATS:
+        return data, KEEP_FORMATS[img.format]
+    out = io.BytesIO()
+    img.convert("RGBA").save(out, "PNG")
+    return out.getvalue(), "png"
+
+def select(fetched: List[Tuple[Dict[str, Any], bytes]], max_per_type: int = MAX_PER_TYPE) -> List[Tuple[Dict[str, Any], bytes, str]]:
+    # Decode, dedup (pHash for rasters, normalized content for SVG), rank, keep top N per kind.
+    # Returned best-first as (asset, bytes, extension).
+    rasters = []
+    vectors = []
+    for asset, data in fetched:
+        if not data:
+            continue
+        if is_svg(data):
+            vectors.append((asset, data))
+            continue
+        img = _decode(data)
+        if img is None or img.width < 8 or img.height < 8:
+            continue
+        rasters.append((asset, data, img))
+
+    ranked: List[Tuple[float, Dict[str, Any], bytes, str]] = []
+
+    if rasters:
+        # Larger decoded images win among duplicates (the 192px icon over the 16px one)
+        scores = np.array([
+            dom_score(a) + 2 * min(img.width * img.height, 512 * 512) / (512 * 512)
+            for a, _, img in rasters
+        ])
+        order = np.argsort(-scores, kind="stable")
+        kinds = np.array([kind(rasters[i][0]) for i in order])
+        # A favicon that matches the header logo is still kept as the favicon
+        duplicates = duplicate_matrix(perceptual_hashes([rasters[i][2] for i in order])) & (kinds[:, None] == kinds[None, :])
+        kept = np.zeros(len(order), dtype=bool)
+        for position in range(len(order)):
+            kept[position] = not (duplicates[position, :position] & kept[:position]).any()
+        for position in np.flatnonzero(kept):
+            asset, data, img = rasters[order[position]]
+            data, ext = _encode(img, data)
+            ranked.append((scores[order[position]], asset, data, ext))
+
+    seen_svgs = set()
+    for asset, data in vectors:
+        key = _svg_key(data)
+        if key in seen_svgs:
+            continue
+        seen_svgs.add(key)
+        ranked.append((dom_score(asset), asset, data, "svg"))
+
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    counts: Dict[str, int] = {}
+    selected = []
+    for _, asset, data, ext in ranked:
+        k = kind(asset)
+        if counts.get(k, 0) >= max_per_type:
+            continue
+        counts[k] = counts.get(k, 0) + 1
+        selected.append((asset, data, ext))
+    return selected
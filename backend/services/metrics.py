@@ -0,0 +1,186 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+# Seconds; covers sub-second cache hits up to multi-minute crawls
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Bytes; 1KB .. 64MB
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+# Tokens per Gemini call
+TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            # Layout: one counter per bucket, then +Inf count, then sum
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram("brand_stage_duration_seconds", "Duration of pipeline stages and service calls.", ("stage", "status"))
+STAGE_BYTES = registry.histogram("brand_stage_bytes", "Bytes transferred or written per stage.", ("stage",), BYTES_BUCKETS)
+BROWSER_MEMORY = registry.histogram("brand_browser_js_heap_bytes", "Chromium JS heap in use after page load.", ("stage",), BYTES_BUCKETS)
+GEMINI_TOKENS = registry.histogram("brand_gemini_tokens", "Gemini token usage per call.", ("stage", "kind"), TOKEN_BUCKETS)
+CACHE_LOOKUPS = registry.counter("brand_cache_lookups_total", "Result cache lookups.", ("cache", "result"))
+JOB_SECONDS = registry.histogram("brand_job_duration_seconds", "End-to-end analysis job duration.", ("status",))
+STARTUP_SECONDS = registry.gauge("brand_startup_seconds", "Cold-start timings: imports, time to serve, warmup phases, first requests.", ("phase",))
+
+# Spans of the job currently running in this context (None when not tracing)
+current_trace: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("current_trace", default=None)
+
+class Span:
+    def __init__(self, stage: str, attrs: Dict[str, Any]):
+        self.stage = stage
+        self.attrs = attrs
+        self.status = "ok"
+        self.start = time.time()
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stage": self.stage, "start": self.start, "duration": round(self.duration, 4), "status": self.status, **self.attrs}
+
+@contextmanager
+def span(stage: str, **attrs):
+    s = Span(stage, attrs)
+    started = time.perf_counter()
+    try:
+        yield s
+    except BaseException:
+        s.status = "error"
+        raise
+    finally:
+        s.duration = time.perf_counter() - started
+        record(s)
+
+def record(s: Span):
+    STAGE_SECONDS.observe(s.duration, stage=s.stage, status=s.status)
+    if s.attrs.get("bytes"):
+        STAGE_BYTES.observe(s.attrs["bytes"], stage=s.stage)
+    if s.attrs.get("js_heap_bytes"):
+        BROWSER_MEMORY.observe(s.attrs["js_heap_bytes"], stage=s.stage)
+    for kind in ("prompt_tokens", "output_tokens", "total_tokens"):
+        if s.attrs.get(kind):
+            GEMINI_TOKENS.observe(s.attrs[kind], stage=s.stage, kind=kind)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append(s.to_dict())
+
+def record_usage(s: Span, response):
+    # google-genai responses carry usage_metadata with per-call token counts
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    s.set(
+        prompt_tokens=getattr(usage, "prompt_token_count", None) or 0,
+        output_tokens=getattr(usage, "candidates_token_count", None) or 0,
+        total_tokens=getattr(usage, "total_token_count", None) or 0,
+    )
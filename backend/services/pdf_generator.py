@@ -1,18 +1,43 @@
 import os
+import time
+import uuid
 import traceback
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+from services.metrics import span
+
+class PDFDeadlineExceeded(Exception):
+    pass
 
 class PDFGenerator:
-    def generate_pdf(self, task_id: str, base_dir: str, title: str, report_text: str, color_assets: list = None, brand_assets: list = None, css_assets: list = None):
+    @staticmethod
+    def preload():
+        # ReportLab, svglib and the standard font metrics load on first use; pay that at startup
+        import io
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Table
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.graphics import renderPDF
+        from svglib.svglib import svg2rlg
+        styles = getSampleStyleSheet()
+        doc = SimpleDocTemplate(io.BytesIO(), pagesize=letter)
+        doc.build([Paragraph("Warmup", styles['Title']), Paragraph("warmup", styles['Normal']), Table([["warmup"]])])
+
+    def generate_pdf(self, task_id: str, base_dir: str, title: str, report_text: str, color_assets: list = None, brand_assets: list = None, css_assets: list = None, report: dict = None, deadline: float = None):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib import colors
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         path = os.path.join(base_dir, task_id, f"{title}_Brand_Report.pdf")
-        
+        # Built under a temp name and moved into place only if done by `deadline` (time.monotonic());
+        # a build the job has given up on stops at its next page and never leaves a PDF behind
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+        def check_deadline(canvas, doc):
+            if deadline is not None and time.monotonic() > deadline:
+                raise PDFDeadlineExceeded()
+
         try:
-            doc = SimpleDocTemplate(path, pagesize=letter)
+            doc = SimpleDocTemplate(tmp_path, pagesize=letter)
             styles = getSampleStyleSheet()
             story = []
             
@@ -27,6 +52,16 @@ class PDFGenerator:
                 img = Image(snapshot_path, width=450, height=280) 
                 story.append(img)
                 story.append(Spacer(1, 20))
+
+            # Mobile and dark-mode views, when they were captured
+            views = [(name, os.path.join(base_dir, task_id, "Snapshot", f"{name}.png")) for name in ("mobile", "dark")]
+            views = [(name, p) for name, p in views if os.path.exists(p)]
+            if views:
+                from reportlab.platypus import Table
+                story.append(Paragraph("Responsive & Dark Mode Views", styles['Heading2']))
+                cells = [Image(p, width=130 if name == "mobile" else 300, height=280 if name == "mobile" else 170, kind='proportional') for name, p in views]
+                story.append(Table([cells, [n.title() for n, _ in views]]))
+                story.append(Spacer(1, 20))
             
             # Add Color Palette if available
             if color_assets:
@@ -148,39 +183,145 @@ class PDFGenerator:
             # Report Content (from Gemini)
             story.append(Paragraph("Detailed Analysis & Guidelines", styles['Heading2']))
             story.append(Spacer(1, 12))
+            if report:
+                # Structured report mode: typed fields map straight to flowables
+                story.extend(self.structured_story(report, styles))
+            else:
+                story.extend(self.markdown_story(report_text, styles))
             
-            style_body = styles['BodyText']
-            for line in report_text.split('\n'):
-                line = line.strip()
-                if not line: continue
-                
-                if line.startswith('# '):
-                    story.append(Paragraph(line.replace('# ', ''), styles['Heading1']))
-                elif line.startswith('## '):
-                    story.append(Paragraph(line.replace('## ', ''), styles['Heading2']))
-                elif line.startswith('### '):
-                    story.append(Paragraph(line.replace('### ', ''), styles['Heading3']))
-                elif line.startswith('- ') or line.startswith('* '):
-                    story.append(Paragraph(f"• {line[2:]}", style_body))
-                else:
-                    # Basic cleaning of bold/italic markdown for ReportLab Paragraph
-                    import re
-                    # Bold
-                    clean_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-                    clean_line = re.sub(r'__(.*?)__', r'<b>\1</b>', clean_line)
-                    # Italic
-                    clean_line = re.sub(r'\*(.*?)\*', r'<i>\1</i>', clean_line)
-                    clean_line = re.sub(r'_(.*?)_', r'<i>\1</i>', clean_line)
-                    
-                    try:
-                        story.append(Paragraph(clean_line, style_body))
-                    except:
-                        # If XML parsing still fails, try plain text
-                        story.append(Paragraph(line, style_body))
-                story.append(Spacer(1, 6))
-            
-            doc.build(story)
+            with span("pdf.build", flowables=len(story)) as s:
+                doc.build(story, onFirstPage=check_deadline, onLaterPages=check_deadline)
+                s.set(bytes=os.path.getsize(tmp_path))
+            check_deadline(None, doc)
+            os.replace(tmp_path, path)
             return path
+        except PDFDeadlineExceeded:
+            print(f"PDF generation for {task_id} passed its deadline; discarded")
+            return None
         except Exception as e:
             print(f"PDF Generation failed: {traceback.format_exc() if 'traceback' in globals() else e}")
             return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def markdown_story(self, report_text: str, styles) -> list:
+        from reportlab.platypus import Paragraph, Spacer
+        story = []
+        style_body = styles['BodyText']
+        for line in report_text.split('\n'):
+            line = line.strip()
+            if not line: continue
+            
+            if line.startswith('# '):
+                story.append(Paragraph(line.replace('# ', ''), styles['Heading1']))
+            elif line.startswith('## '):
+                story.append(Paragraph(line.replace('## ', ''), styles['Heading2']))
+            elif line.startswith('### '):
+                story.append(Paragraph(line.replace('### ', ''), styles['Heading3']))
+            elif line.startswith('- ') or line.startswith('* '):
+                story.append(Paragraph(f"• {line[2:]}", style_body))
+            else:
+                # Basic cleaning of bold/italic markdown for ReportLab Paragraph
+                import re
+                # Bold
+                clean_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
+                clean_line = re.sub(r'__(.*?)__', r'<b>\1</b>', clean_line)
+                # Italic
+                clean_line = re.sub(r'\*(.*?)\*', r'<i>\1</i>', clean_line)
+                clean_line = re.sub(r'_(.*?)_', r'<i>\1</i>', clean_line)
+                
+                try:
+                    story.append(Paragraph(clean_line, style_body))
+                except:
+                    # If XML parsing still fails, try plain text
+                    story.append(Paragraph(line, style_body))
+            story.append(Spacer(1, 6))
+        return story
+
+    def structured_story(self, report: dict, styles) -> list:
+        from xml.sax.saxutils import escape
+        from reportlab.lib import colors
+        from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+        body = styles['BodyText']
+        story = []
+
+        def heading(text):
+            story.append(Paragraph(escape(text), styles['Heading3']))
+
+        def bullets(items, prefix=""):
+            for item in items:
+                story.append(Paragraph(f"• {prefix}{escape(item)}", body))
+
+        heading("Executive Summary")
+        story.append(Paragraph(escape(report.get("executive_summary", "")), body))
+        story.append(Spacer(1, 10))
+
+        palette = report.get("palette") or []
+        if palette:
+            heading("Color Roles")
+            rows = [["", "Role", "Hex", "Usage"]]
+            fills = []
+            for i, c in enumerate(palette, start=1):
+                rows.append(["", c.get("role", "").title(), c.get("hex", ""), Paragraph(escape(" ".join(filter(None, [c.get("name"), c.get("usage")]))), body)])
+                try:
+                    fills.append(('BACKGROUND', (0, i), (0, i), colors.HexColor(c.get("hex", ""))))
+                except Exception:
+                    pass
+            t = Table(rows, colWidths=[24, 80, 70, 290])
+            t.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+                *fills,
+            ]))
+            story.append(t)
+            story.append(Spacer(1, 10))
+
+        typography = report.get("typography") or []
+        if typography:
+            heading("Typography Roles")
+            rows = [["Role", "Family", "Weights", "Usage"]]
+            for f in typography:
+                family = escape(f.get("family", "")) + (f" <font size=7>/ {escape(f['fallback'])}</font>" if f.get("fallback") else "")
+                rows.append([f.get("role", "").title(), Paragraph(family, body), ", ".join(f.get("weights") or []), Paragraph(escape(f.get("usage", "")), body)])
+            t = Table(rows, colWidths=[70, 130, 70, 194])
+            t.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+            ]))
+            story.append(t)
+            story.append(Spacer(1, 10))
+
+        rules = report.get("logo_rules") or []
+        if rules:
+            heading("Logo Usage")
+            bullets([r.get("rule", "") for r in rules if r.get("kind") != "dont"], "<b>Do:</b> ")
+            bullets([r.get("rule", "") for r in rules if r.get("kind") == "dont"], "<b>Don’t:</b> ")
+            story.append(Spacer(1, 10))
+
+        voice = report.get("voice") or {}
+        if voice.get("summary") or voice.get("traits"):
+            heading("Brand Voice")
+            if voice.get("summary"):
+                story.append(Paragraph(escape(voice["summary"]), body))
+            if voice.get("traits"):
+                story.append(Paragraph(f"<b>Traits:</b> {escape(', '.join(voice['traits']))}", body))
+            bullets(voice.get("do") or [], "<b>Do:</b> ")
+            bullets(voice.get("dont") or [], "<b>Don’t:</b> ")
+            story.append(Spacer(1, 10))
+
+        for section in report.get("sections") or []:
+            heading(section.get("heading", ""))
+            for paragraph in section.get("paragraphs") or []:
+                story.append(Paragraph(escape(paragraph), body))
+                story.append(Spacer(1, 4))
+            bullets(section.get("bullets") or [])
+            story.append(Spacer(1, 10))
+
+        if report.get("sources"):
+            heading("Sources")
+            for source in report["sources"]:
+                story.append(Paragraph(escape(source), styles['Italic']))
+        return story
@@ -0,0 +1,99 @@
+import json
+from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+
+# Typed brand report produced by the single-call "structured" report mode. PDFGenerator renders it
+# directly; to_markdown/guidelines_markdown keep data.json's report and guidelines fields populated
+# for the frontend and the search index.
+
+class ColorRole(BaseModel):
+    hex: str = Field(description="Hex code, e.g. #635BFF")
+    role: str = Field(description="primary, secondary, accent, background, text or neutral")
+    name: str = ""
+    usage: str = ""
+
+class TypeRole(BaseModel):
+    family: str
+    role: str = Field(description="heading, body, display, ui or monospace")
+    weights: List[str] = []
+    fallback: str = ""
+    usage: str = ""
+
+class LogoRule(BaseModel):
+    rule: str
+    kind: str = Field("do", description="do or dont")
+
+class Voice(BaseModel):
+    summary: str = ""
+    traits: List[str] = []
+    do: List[str] = []
+    dont: List[str] = []
+
+class Section(BaseModel):
+    heading: str
+    paragraphs: List[str] = []
+    bullets: List[str] = []
+
+class BrandReport(BaseModel):
+    executive_summary: str
+    palette: List[ColorRole] = []
+    typography: List[TypeRole] = []
+    logo_rules: List[LogoRule] = []
+    voice: Voice = Voice()
+    sections: List[Section] = Field([], description="Further sections such as Recommendations")
+    # Filled from the response's grounding metadata, not by the model
+    sources: List[str] = []
+
+def schema_json() -> str:
+    schema = BrandReport.model_json_schema()
+    schema["properties"].pop("sources", None)
+    return json.dumps(schema, separators=(",", ":"))
+
+def parse_report(text: str) -> Optional[BrandReport]:
+    # Tolerates a ```json fence or prose around the object when the schema isn't enforced natively
+    if not text:
+        return None
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        return BrandReport.model_validate_json(text[start:end + 1])
+    except ValidationError as e:
+        print(f"Structured report did not match the schema: {e.error_count()} error(s)")
+        return None
+
+def guidelines_markdown(report: BrandReport, sources: bool = True) -> str:
+    lines = []
+    if report.logo_rules:
+        lines += ["## Logo Usage"]
+        lines += [f"- {'Do' if r.kind == 'do' else 'Don’t'}: {r.rule}" for r in report.logo_rules]
+        lines.append("")
+    if report.voice.summary or report.voice.traits:
+        lines += ["## Brand Voice", report.voice.summary]
+        if report.voice.traits:
+            lines.append(f"Traits: {', '.join(report.voice.traits)}")
+        lines += [f"- Do: {d}" for d in report.voice.do]
+        lines += [f"- Don’t: {d}" for d in report.voice.dont]
+        lines.append("")
+    if sources and report.sources:
+        lines += ["## Sources"] + [f"- {s}" for s in report.sources]
+    return "\n".join(lines).strip()
+
+def to_markdown(report: BrandReport, title: str) -> str:
+    lines = [f"# {title} Brand Identity Report", "", "## Executive Summary", report.executive_summary, ""]
+    if report.palette:
+        lines.append("## Color Palette")
+        lines += [f"- **{c.role.title()}** {c.hex}{' (' + c.name + ')' if c.name else ''}: {c.usage}".rstrip(": ") for c in report.palette]
+        lines.append("")
+    if report.typography:
+        lines.append("## Typography")
+        lines += [f"- **{t.role.title()}** {t.family}{' ' + ', '.join(t.weights) if t.weights else ''}: {t.usage}".rstrip(": ") for t in report.typography]
+        lines.append("")
+    guidelines = guidelines_markdown(report, sources=False)
+    if guidelines:
+        lines += [guidelines, ""]
+    for section in report.sections:
+        lines += [f"## {section.heading}"] + section.paragraphs + [f"- {b}" for b in section.bullets] + [""]
+    if report.sources:
+        lines += ["## Sources"] + [f"- {s}" for s in report.sources]
+    return "\n".join(lines).strip()
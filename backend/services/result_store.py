@@ -0,0 +1,101 @@
+import os
+import asyncio
+import json
+import shutil
+import aiofiles
+from typing import Dict, Any, Optional
+
+from services.asset_manager import AssetManager
+from services.artifacts import precompress
+
+# Sections served by /jobs/{task_id}/{section}; everything else stays on disk
+SECTIONS = ["summary", "report", "guidelines", "palette", "assets", "css"]
+
+class ResultStore:
+    def __init__(self, base_dir: str = "results"):
+        self.base_dir = base_dir
+
+    def data_path(self, brand_id: str) -> str:
+        return os.path.join(self.base_dir, brand_id, "data.json")
+
+    def exists(self, brand_id: str) -> bool:
+        return os.path.exists(self.data_path(brand_id))
+
+    def partial_path(self, brand_id: str) -> str:
+        return os.path.join(self.base_dir, brand_id, ".partial")
+
+    def is_complete(self, brand_id: str) -> bool:
+        # Partial results (a job that ran out of budget) are served but not reused as a cache hit
+        return self.exists(brand_id) and not os.path.exists(self.partial_path(brand_id))
+
+    def version(self, brand_id: str) -> Optional[str]:
+        # Cheap validator from file metadata; lets 304s skip reading data.json entirely
+        try:
+            st = os.stat(self.data_path(brand_id))
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+    async def save(self, brand_id: str, data: Dict[str, Any]):
+        path = self.data_path(brand_id)
+        tmp_path = path + ".tmp"
+        async with aiofiles.open(tmp_path, "w") as f:
+            await f.write(json.dumps(data, default=str)) # handle non-serializable if any
+        os.replace(tmp_path, path)
+        if data.get("partial"):
+            open(self.partial_path(brand_id), "w").close()
+        elif os.path.exists(self.partial_path(brand_id)):
+            os.remove(self.partial_path(brand_id))
+        await asyncio.to_thread(precompress, path)
+
+    def delete(self, brand_id: str) -> bool:
+        root = os.path.realpath(self.base_dir)
+        path = os.path.realpath(os.path.join(self.base_dir, brand_id))
+        # Dot-directories (.index, .thumbs) are not brands
+        if brand_id.startswith(".") or not path.startswith(root + os.sep) or not os.path.isdir(path):
+            return False
+        shutil.rmtree(path)
+        return True
+
+    async def load(self, brand_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with aiofiles.open(self.data_path(brand_id), "r") as f:
+                return json.loads(await f.read())
+        except (OSError, ValueError):
+            return None
+
+    def links(self, brand_id: str) -> Dict[str, str]:
+        return {name: f"/jobs/{brand_id}/{name}" for name in SECTIONS}
+
+    def section(self, brand_id: str, data: Dict[str, Any], name: str):
+        brand_data = data.get("brand_data", {})
+        if name == "summary":
+            return {
+                "brand_data": {k: v for k, v in brand_data.items() if k not in ("css", "assets")},
+                "pdf_url": data.get("pdf_url"),
+                "screenshot_url": data.get("screenshot_url"),
+                "variant_screenshot_urls": data.get("variant_screenshot_urls", {}),
+                "assets_urls": data.get("assets_urls", []),
+                "css_urls": data.get("css_urls", []),
+                "thumbnail_urls": data.get("thumbnail_urls", {}),
+            }
+        if name == "report":
+            return data.get("report", "")
+        if name == "guidelines":
+            return data.get("guidelines", "")
+        if name == "palette":
+            swatches = []
+            for color in brand_data.get("colors", []):
+                hex_color = AssetManager.rgb_to_hex(color)
+                if hex_color:
+                    swatches.append({
+                        "color": color,
+                        "hex": hex_color,
+                        "swatch_url": f"/{self.base_dir}/{brand_id}/Colors/{hex_color.replace('#', '')}.png",
+                    })
+            return {"colors": brand_data.get("colors", []), "swatches": swatches, "fonts": brand_data.get("fonts", []), "variants": brand_data.get("variants", {})}
+        if name == "assets":
+            return {"assets": brand_data.get("assets", []), "assets_urls": data.get("assets_urls", [])}
+        if name == "css":
+            return {"css": brand_data.get("css", []), "css_urls": data.get("css_urls", [])}
+        raise KeyError(name)
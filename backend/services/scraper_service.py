@@ -1,140 +1,334 @@
+import os
 import asyncio
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import Page
 from playwright_stealth import Stealth
 from typing import Dict, List, Any
-import re
 from urllib.parse import urljoin
 
+from services.metrics import span
+from services.block_detection import BlockedPageError, PageLoadError, detect_block
+from services.static_scraper import StaticScraper
+from services.browser_pool import BrowserPool, browser_pool
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+EXTRA_HTTP_HEADERS = {
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Referer": "https://www.google.com/",
+    "sec-ch-ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+}
+
+MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36"
+
+# Extra views captured next to the desktop page, as pages of the same context. Viewport, device scale
+# factor and mobile emulation are set per page over CDP, so the pages share the context's HTTP cache.
+VARIANTS = {
+    "mobile": {
+        "width": 390, "height": 844, "scale": 2, "mobile": True, "color_scheme": "light",
+        # Client hints matching MOBILE_USER_AGENT; page-level headers override the context's desktop ones
+        "headers": {"sec-ch-ua-mobile": "?1", "sec-ch-ua-platform": '"Android"'},
+    },
+    "dark": {"width": 1920, "height": 1080, "scale": 1, "mobile": False, "color_scheme": "dark"},
+}
+
 class ScraperService:
-    async def analyze_url(self, url: str) -> Dict[str, Any]:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox", 
-                    "--disable-setuid-sandbox", 
-                    "--disable-dev-shm-usage",
-                    "--disable-http2"
-                ]
-            )
-            context = await browser.new_context(
-                viewport={"width": 1920, "height": 1080},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                extra_http_headers={
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                    "Referer": "https://www.google.com/",
-                    "sec-ch-ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": '"Windows"',
-                },
-                ignore_https_errors=True
-            )
-            page = await context.new_page()
-            
-            # Apply stealth
-            await Stealth().apply_stealth_async(page)
-            
+    def __init__(self, settle_time: float = None, pool: BrowserPool = None, time_budget: float = None):
+        # Seconds to wait after the first byte arrives; complex sites like Myntra/Nykaa need ~15s
+        if settle_time is None:
+            settle_time = float(os.getenv("SCRAPER_SETTLE_TIME", "15"))
+        # Scrape slice of the job deadline: settle and navigation shrink so a slow site still
+        # leaves time to extract something before the slice runs out
+        self.time_budget = time_budget
+        if time_budget:
+            settle_time = min(settle_time, time_budget * 0.25)
+        self.settle_time = settle_time
+        # Contexts come from the shared, already-running Chromium instead of a launch per job
+        self.pool = pool or browser_pool
+
+    def new_context(self):
+        return self.pool.context(
+            viewport={"width": 1920, "height": 1080},
+            user_agent=USER_AGENT,
+            extra_http_headers=EXTRA_HTTP_HEADERS,
+            ignore_https_errors=True
+        )
+
+    async def analyze(self, url: str, screenshot: bool = True, variants: List[str] = None) -> Dict[str, Any]:
+        # Fast path: plain HTTP + streaming parse for server-rendered pages when no screenshot is needed.
+        # Falls back to Chromium for JS shells, blocked or non-HTML responses.
+        if not screenshot and not variants:
             try:
-                # 1. Navigate
-                # 1. Navigate
-                try:
-                    await page.goto(url, wait_until="commit", timeout=60000)
-                except Exception as e:
-                    print(f"Navigation warning: {e}")
-                
-                await asyncio.sleep(15) # More time for complex sites like Myntra/Nykaa
-                
-                # Check if we at least have a body
-                # Use a small retry loop for content because Nykaa/Myntra can be 'navigating' for a while
-                content = ""
-                for _ in range(3):
+                with span("scraper.static", url=url):
+                    result = await StaticScraper({"User-Agent": USER_AGENT, **EXTRA_HTTP_HEADERS}).analyze(url)
+                if result:
+                    result["tier"] = "static"
+                    return result
+            except Exception as e:
+                print(f"[{url}] Static fetch failed, using browser: {e}")
+        result = await self.analyze_url(url, variants)
+        result["tier"] = "browser"
+        return result
+
+    async def analyze_url(self, url: str, variants: List[str] = None) -> Dict[str, Any]:
+        async with self.new_context() as context:
+            pages = {"desktop": await context.new_page()}
+            for name in variants or []:
+                pages[name] = await context.new_page()
+            # Variants load and extract alongside the desktop page; Chromium's cache lock makes
+            # concurrent requests for the same resource wait for the first download instead of refetching
+            variant_tasks = {name: asyncio.ensure_future(self.capture(page, url, name)) for name, page in pages.items() if name != "desktop"}
+            try:
+                result = await self.capture(pages["desktop"], url)
+                for name, task in variant_tasks.items():
                     try:
-                        content = await page.content()
-                        if content: break
+                        merge_variant(result, name, await task)
                     except Exception as e:
-                        print(f"Content retrieval attempt failed: {e}")
-                        await asyncio.sleep(5)
-                
-                print(f"[{url}] Content length: {len(content)}")
-                if content:
-                    print(f"[{url}] Content snippet: {content[:200].replace('\n', ' ')}")
-                
-                if not content or len(content) < 500:
-                   raise Exception(f"Page failed to load any meaningful content. Length: {len(content)}")
-                
-                # 2. Screenshot
-                # Scroll to bottom and back to top to trigger any lazy loading
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(2)
-                await page.evaluate("window.scrollTo(0, 0)")
-                await asyncio.sleep(1)
-                
-                screenshot_bytes = await page.screenshot(full_page=True)
-                
-                # 3. Extract Meta Info
-                title = await page.title()
-                if not title: title = url
-                try:
-                    description = await page.eval_on_selector(
-                        "meta[name='description']", 
-                        "el => el.content"
-                    )
-                except:
-                    description = ""
-                
-                # 4. Extract Brand Assets (Favicons, Logos)
-                assets = await self._extract_assets(page, url)
-                
-                # 5. Extract Fonts
-                fonts = await self._extract_fonts(page)
-                
-                # 6. Extract Colors
-                colors = await self._extract_colors(page)
-                
-                # 7. Extract CSS
-                css = await self._extract_css(page)
-                
-                return {
-                    "url": url,
-                    "title": title,
-                    "description": description,
-                    "screenshot": screenshot_bytes,
-                    "assets": assets,
-                    "fonts": fonts,
-                    "colors": colors,
-                    "css": css
-                }
-                
+                        print(f"[{url}] {name} view failed: {e}")
+                return result
             finally:
-                await browser.close()
+                for task in variant_tasks.values():
+                    task.cancel()
+                for page in pages.values():
+                    await page.close()
+
+    async def capture(self, page: Page, url: str, variant: str = None) -> Dict[str, Any]:
+        cdp = await self.emulate(page, VARIANTS[variant]) if variant else None
+        try:
+            with span("scraper.load", url=url, variant=variant or "desktop") as s:
+                on_response = self.track_transfer(page, s)
+                await self.load_page(page, url)
+                page.remove_listener("response", on_response)
+                s.set(js_heap_bytes=await self.browser_memory(page))
+            with span("scraper.extract", url=url, variant=variant or "desktop") as s:
+                # Variants keep to the first screen: that's where headers and logos differ
+                result = await self.extract_page(page, url, screenshot=True, full_page=variant is None)
+                s.set(bytes=len(result["screenshot"] or b""))
+            return result
+        finally:
+            if cdp:
+                try:
+                    await cdp.detach()
+                except Exception:
+                    pass
+
+    async def emulate(self, page: Page, variant: Dict[str, Any]):
+        # Per-page device emulation inside a shared context (Chromium only); the session must stay
+        # attached for the overrides to hold
+        await page.set_viewport_size({"width": variant["width"], "height": variant["height"]})
+        await page.emulate_media(color_scheme=variant["color_scheme"])
+        if variant.get("headers"):
+            await page.set_extra_http_headers(variant["headers"])
+        cdp = await page.context.new_cdp_session(page)
+        await cdp.send("Emulation.setDeviceMetricsOverride", {
+            "width": variant["width"],
+            "height": variant["height"],
+            "deviceScaleFactor": variant["scale"],
+            "mobile": variant["mobile"],
+        })
+        if variant["mobile"]:
+            await cdp.send("Emulation.setTouchEmulationEnabled", {"enabled": True, "maxTouchPoints": 5})
+            await cdp.send("Emulation.setUserAgentOverride", {"userAgent": MOBILE_USER_AGENT, "platform": "Android"})
+        return cdp
+
+    def track_transfer(self, page: Page, s):
+        # Approximate network bytes from Content-Length; avoids buffering bodies
+        def on_response(response):
+            try:
+                s.add("bytes", int(response.headers.get("content-length", 0)))
+            except (TypeError, ValueError):
+                pass
+        page.on("response", on_response)
+        return on_response
+
+    async def browser_memory(self, page: Page) -> int:
+        # JS heap in use for this page via CDP (Chromium only)
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+            metrics = await cdp.send("Performance.getMetrics")
+            await cdp.detach()
+            for metric in metrics.get("metrics", []):
+                if metric["name"] == "JSHeapUsedSize":
+                    return int(metric["value"])
+        except Exception as e:
+            print(f"Could not read browser memory: {e}")
+        return 0
+
+    def navigation_timeout(self) -> float:
+        # Milliseconds for page.goto
+        if self.time_budget:
+            return min(60000, self.time_budget * 0.4 * 1000)
+        return 60000
+
+    async def load_page(self, page: Page, url: str, timeout: float = None) -> str:
+        timeout = timeout or self.navigation_timeout()
+        # Apply stealth
+        await Stealth().apply_stealth_async(page)
+
+        # 1. Navigate
+        status = None
+        navigation_error = None
+        try:
+            response = await page.goto(url, wait_until="commit", timeout=timeout)
+            status = response.status if response else None
+        except Exception as e:
+            navigation_error = e
+            print(f"Navigation warning: {e}")
+        if status is None:
+            # No response from the site: an error page or about:blank, not a bot wall
+            raise PageLoadError(f"Could not load {url}: {navigation_error or 'no response'}")
+        
+        await asyncio.sleep(self.settle_time)
+        
+        # Check if we at least have a body
+        # Use a small retry loop for content because Nykaa/Myntra can be 'navigating' for a while
+        content = ""
+        for _ in range(3):
+            try:
+                content = await page.content()
+                if content: break
+            except Exception as e:
+                print(f"Content retrieval attempt failed: {e}")
+                await asyncio.sleep(min(5, self.settle_time))
+        
+        print(f"[{url}] Content length: {len(content)}")
+        if content:
+            snippet = content[:200].replace('\n', ' ')
+            print(f"[{url}] Content snippet: {snippet}")
+        
+        reason = detect_block(content, status)
+        if reason:
+            raise BlockedPageError(reason)
+        return content
 
-    async def _extract_assets(self, page: Page, base_url: str) -> List[Dict[str, str]]:
+    async def extract_page(self, page: Page, url: str, screenshot: bool = True, full_page: bool = True) -> Dict[str, Any]:
+        # 2. Screenshot
+        screenshot_bytes = None
+        if screenshot:
+            # Scroll to bottom and back to top to trigger any lazy loading
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await asyncio.sleep(2)
+            await page.evaluate("window.scrollTo(0, 0)")
+            await asyncio.sleep(1)
+            
+            screenshot_bytes = await page.screenshot(full_page=full_page)
+        
+        # 3. Extract Meta Info
+        title = await page.title()
+        if not title: title = url
+        try:
+            description = await page.eval_on_selector(
+                "meta[name='description']", 
+                "el => el.content"
+            )
+        except:
+            description = ""
+        
+        # 4. Extract Brand Assets (Favicons, Logos)
+        assets = await self._extract_assets(page, url)
+        
+        # 5. Extract Fonts
+        fonts = await self._extract_fonts(page)
+        
+        # 6. Extract Colors
+        colors = await self._extract_colors(page)
+        
+        # 7. Extract CSS
+        css = await self._extract_css(page)
+        
+        result = {
+            "url": url,
+            "title": title,
+            "description": description,
+            "assets": assets,
+            "fonts": fonts,
+            "colors": colors,
+            "css": css
+        }
+        if screenshot:
+            result["screenshot"] = screenshot_bytes
+        return result
+
+    async def _extract_assets(self, page: Page, base_url: str) -> List[Dict[str, Any]]:
         assets = []
         
-        # Favicons
+        # Favicons, with declared sizes so the best one can be picked before downloading
         icons = await page.evaluate("""() => {
-            return Array.from(document.querySelectorAll("link[rel*='icon']")).map(el => el.href);
+            return Array.from(document.querySelectorAll("link[rel*='icon']")).map(el => ({
+                url: el.href, rel: el.rel || "", sizes: el.getAttribute("sizes") || ""
+            }));
         }""")
         for icon in icons:
-            assets.append({"type": "favicon", "url": urljoin(base_url, icon)})
+            if icon["url"]:
+                assets.append({"type": "favicon", "url": urljoin(base_url, icon["url"]), "rel": icon["rel"], "sizes": icon["sizes"]})
             
-        # Logos (Heuristic: images with 'logo' in src, class, or id)
+        # Logos: images and inline SVGs that mention 'logo', or that sit in the header linking home.
+        # Each carries its rendered box and position for ranking; inline SVGs are serialized as-is.
         logos = await page.evaluate("""() => {
-            return Array.from(document.querySelectorAll("img, svg")).filter(el => {
-                const src = el.src || "";
-                const cls = el.className || "";
-                const id = el.id || "";
-                const alt = el.alt || "";
-                return (src.toLowerCase().includes('logo') || 
-                        cls.toString().toLowerCase().includes('logo') || 
-                        id.toString().toLowerCase().includes('logo') ||
-                        alt.toLowerCase().includes('logo'));
-            }).map(el => el.src || ""); // Note: handling SVGs without src? For now just src.
+            const linksHome = el => {
+                const a = el.closest("a[href]");
+                if (!a) return false;
+                try {
+                    const u = new URL(a.href, location.href);
+                    return u.origin === location.origin && (u.pathname === "/" || u.pathname === "");
+                } catch (e) { return false; }
+            };
+            const hasHint = el => {
+                const a = el.closest("a");
+                return [el.getAttribute("src"), el.getAttribute("class"), el.id, el.getAttribute("alt"),
+                        el.getAttribute("aria-label"), a && a.getAttribute("class"), a && a.getAttribute("aria-label")]
+                    .join(" ").toLowerCase().includes("logo");
+            };
+            const describe = el => {
+                const r = el.getBoundingClientRect();
+                const style = getComputedStyle(el);
+                return {
+                    bbox: {x: Math.round(r.left + scrollX), y: Math.round(r.top + scrollY), width: Math.round(r.width), height: Math.round(r.height)},
+                    visible: r.width > 0 && r.height > 0 && style.visibility !== "hidden" && parseFloat(style.opacity || "1") > 0,
+                    in_header: !!el.closest("header, nav, [role='banner'], [class*='header'], [id*='header']"),
+                    links_home: linksHome(el),
+                    logo_hint: hasHint(el),
+                };
+            };
+            const out = [];
+            for (const el of document.querySelectorAll("img")) {
+                const src = el.currentSrc || el.src;
+                if (!src) continue;
+                const info = describe(el);
+                if (info.logo_hint || (info.in_header && info.links_home)) out.push({type: "logo", url: src, ...info});
+            }
+            for (const el of document.querySelectorAll("svg")) {
+                if (el.parentElement && el.parentElement.closest("svg")) continue;
+                const info = describe(el);
+                if (!(info.logo_hint || (info.in_header && info.links_home))) continue;
+                // Skip hidden sprite sheets and tiny UI icons
+                if (info.bbox.width < 16 || info.bbox.height < 8) continue;
+                const clone = el.cloneNode(true);
+                // <use href="#id"> usually points into a sprite elsewhere in the page; bring the target along
+                const defs = document.createElementNS("http://www.w3.org/2000/svg", "defs");
+                for (const use of el.querySelectorAll("use")) {
+                    const ref = use.getAttribute("href") || use.getAttribute("xlink:href") || "";
+                    const target = ref.startsWith("#") ? document.getElementById(ref.slice(1)) : null;
+                    if (target && !el.contains(target)) defs.appendChild(target.cloneNode(true));
+                }
+                if (defs.childNodes.length) clone.insertBefore(defs, clone.firstChild);
+                clone.setAttribute("xmlns", "http://www.w3.org/2000/svg");
+                if (!clone.getAttribute("width")) clone.setAttribute("width", info.bbox.width);
+                if (!clone.getAttribute("height")) clone.setAttribute("height", info.bbox.height);
+                // currentColor resolves to the rendered text color, not black
+                clone.setAttribute("color", getComputedStyle(el).color);
+                const content = new XMLSerializer().serializeToString(clone);
+                if (content.length <= 200000) out.push({type: "logo_svg", content, ...info});
+            }
+            return out;
         }""")
         for logo in logos:
-            if logo:
-                assets.append({"type": "logo", "url": urljoin(base_url, logo)})
+            if logo.get("url"):
+                logo["url"] = urljoin(base_url, logo["url"])
+            assets.append(logo)
                 
         return assets
 
@@ -206,3 +400,38 @@ class ScraperService:
             return results;
         }""")
         return css_assets
+
+    async def _extract_links(self, page: Page) -> List[Dict[str, str]]:
+        # Anchor hrefs plus their visible text / aria-label, used by the crawler for ranking
+        links = await page.evaluate("""() => {
+            return Array.from(document.querySelectorAll("a[href]")).slice(0, 500).map(el => ({
+                url: el.href,
+                text: ((el.innerText || "") + " " + (el.getAttribute("aria-label") || "")).trim().substring(0, 100)
+            }));
+        }""")
+        return links
+
+def merge_variant(result: Dict[str, Any], name: str, other: Dict[str, Any]):
+    # Folds a mobile/dark view into the desktop result: new assets, fonts and stylesheets are appended
+    # (assets with a variant tag). Colors stay per view under result["variants"] so a dark palette
+    # never leaks into the main swatches, PDF or similarity/search indexes.
+    for asset in result["assets"]:
+        asset.setdefault("variant", "desktop")
+    seen = {a.get("url") or a.get("content") for a in result["assets"]}
+    added = []
+    for asset in other["assets"]:
+        key = asset.get("url") or asset.get("content")
+        if key not in seen:
+            seen.add(key)
+            added.append({**asset, "variant": name})
+    result["assets"].extend(added)
+    result["fonts"].extend(f for f in other["fonts"] if f not in result["fonts"])
+    css_seen = {c.get("url") or c.get("content") for c in result["css"]}
+    result["css"].extend(c for c in other["css"] if (c.get("url") or c.get("content")) not in css_seen)
+    result.setdefault("variants", {})[name] = {
+        "colors": other["colors"],
+        "fonts": other["fonts"],
+        "new_assets": len(added),
+    }
+    if other.get("screenshot"):
+        result.setdefault("variant_screenshots", {})[name] = other["screenshot"]
@@ -0,0 +1,210 @@
+import os
+import re
+import glob
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+from services.similarity_index import font_tokens
+
+# FTS5 columns, in bm25 weight order
+FIELDS = ["title", "report", "guidelines", "fonts", "tokens"]
+FIELD_WEIGHTS = (4.0, 1.0, 1.5, 2.0, 0.5)
+MAX_CSS_BYTES = 1024 * 1024
+MAX_TOKENS = 3000
+
+CUSTOM_PROPERTY = re.compile(r"(--[\w-]+)\s*:\s*([^;{}]{1,200})")
+FONT_FAMILY = re.compile(r"font-family\s*:\s*([^;{}]{1,200})", re.I)
+COLOR_VALUE = re.compile(r"#[0-9a-fA-F]{3,8}\b|rgba?\([^)]{1,60}\)|hsla?\([^)]{1,60}\)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS brands (
+    id INTEGER PRIMARY KEY,
+    brand_id TEXT UNIQUE NOT NULL,
+    title TEXT,
+    url TEXT,
+    extraction TEXT,
+    fonts TEXT,
+    version TEXT,
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    title, report, guidelines, fonts, tokens,
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+"""
+
+def design_tokens(css_texts: List[str]) -> str:
+    # Custom properties, font stacks and color values: the searchable design vocabulary of a site
+    seen = set()
+    tokens = []
+    for css in css_texts:
+        for name, value in CUSTOM_PROPERTY.findall(css):
+            tokens.append(f"{name}: {value.strip()}")
+        tokens += [value.strip() for value in FONT_FAMILY.findall(css)]
+        tokens += COLOR_VALUE.findall(css)
+    unique = []
+    for token in tokens:
+        if token not in seen:
+            seen.add(token)
+            unique.append(token)
+        if len(unique) >= MAX_TOKENS:
+            break
+    return "\n".join(unique)
+
+def fts_query(query: str, fields: Optional[List[str]] = None) -> str:
+    if fields:
+        return "{" + " ".join(fields) + "} : (" + query + ")"
+    return query
+
+def quote_terms(query: str) -> str:
+    # Fallback for input that isn't valid FTS5 syntax: match every word literally
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+class SearchIndex:
+    # SQLite FTS5 index over finished results: report, grounded guidelines, fonts and CSS design tokens.
+    # One row per brand (rowid = brands.id), so updates and deletes touch a single row.
+
+    def __init__(self, path: str = "results/.index/search.db", base_dir: str = "results"):
+        self.path = path
+        self.base_dir = base_dir
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections: callers run in worker threads; WAL lets searches overlap a write
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.row_factory = sqlite3.Row
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _css_texts(self, brand_id: str, brand_data: Dict[str, Any]) -> List[str]:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(self.base_dir, brand_id, "CSS", "*.css"))):
+            try:
+                with open(path, "r", errors="ignore") as f:
+                    texts.append(f.read(MAX_CSS_BYTES))
+            except OSError:
+                pass
+        if not texts:
+            texts = [c.get("content", "") for c in brand_data.get("css", []) if c.get("type") == "inline_css"]
+        return texts
+
+    def indexed_version(self, brand_id: str) -> Optional[str]:
+        with self._connect() as db:
+            row = db.execute("SELECT version FROM brands WHERE brand_id = ?", (brand_id,)).fetchone()
+        return row["version"] if row else None
+
+    def upsert(self, brand_id: str, data: Dict[str, Any], version: Optional[str] = None):
+        if version is not None and self.indexed_version(brand_id) == version:
+            return
+        brand_data = data.get("brand_data", {})
+        families = font_tokens(brand_data.get("fonts", []))
+        values = (
+            brand_data.get("title", brand_id),
+            data.get("report") or "",
+            data.get("guidelines") or "",
+            " ".join(families + brand_data.get("fonts", [])),
+            design_tokens(self._css_texts(brand_id, brand_data)),
+        )
+        with self._connect() as db:
+            existing = db.execute("SELECT id FROM brands WHERE brand_id = ?", (brand_id,)).fetchone()
+            if existing:
+                db.execute("DELETE FROM docs WHERE rowid = ?", (existing["id"],))
+                rowid = existing["id"]
+                db.execute(
+                    "UPDATE brands SET title = ?, url = ?, extraction = ?, fonts = ?, version = ?, indexed_at = ? WHERE id = ?",
+                    (values[0], brand_data.get("url"), brand_data.get("extraction"), "|" + "|".join(families) + "|", version, time.time(), rowid),
+                )
+            else:
+                rowid = db.execute(
+                    "INSERT INTO brands (brand_id, title, url, extraction, fonts, version, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (brand_id, values[0], brand_data.get("url"), brand_data.get("extraction"), "|" + "|".join(families) + "|", version, time.time()),
+                ).lastrowid
+            db.execute("INSERT INTO docs (rowid, title, report, guidelines, fonts, tokens) VALUES (?, ?, ?, ?, ?, ?)", (rowid, *values))
+
+    def delete(self, brand_id: str):
+        with self._connect() as db:
+            existing = db.execute("SELECT id FROM brands WHERE brand_id = ?", (brand_id,)).fetchone()
+            if existing:
+                db.execute("DELETE FROM docs WHERE rowid = ?", (existing["id"],))
+                db.execute("DELETE FROM brands WHERE id = ?", (existing["id"],))
+
+    def reconcile(self, version_of) -> Dict[str, int]:
+        # Bring the index in line with what is on disk: new or rewritten results are (re)indexed,
+        # brands whose results folder was evicted are dropped
+        with self._connect() as db:
+            indexed = {row["brand_id"]: row["version"] for row in db.execute("SELECT brand_id, version FROM brands")}
+        on_disk = {}
+        for brand_id in os.listdir(self.base_dir):
+            if not brand_id.startswith("."):
+                version = version_of(brand_id)
+                if version:
+                    on_disk[brand_id] = version
+        stats = {"indexed": 0, "deleted": 0}
+        for brand_id in indexed.keys() - on_disk.keys():
+            self.delete(brand_id)
+            stats["deleted"] += 1
+        for brand_id, version in on_disk.items():
+            if indexed.get(brand_id) == version:
+                continue
+            try:
+                with open(os.path.join(self.base_dir, brand_id, "data.json"), "r") as f:
+                    self.upsert(brand_id, json.load(f), version)
+                stats["indexed"] += 1
+            except Exception as e:
+                print(f"Could not index {brand_id} for search: {e}")
+        return stats
+
+    def search(
+        self,
+        query: str,
+        fields: Optional[List[str]] = None,
+        font: Optional[str] = None,
+        extraction: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        sql = f"""
+            SELECT b.brand_id, b.title, b.url, b.extraction, b.fonts,
+                   snippet(docs, -1, '<mark>', '</mark>', ' … ', 24) AS snippet,
+                   bm25(docs, {", ".join(str(w) for w in FIELD_WEIGHTS)}) AS rank
+            FROM docs JOIN brands b ON b.id = docs.rowid
+            WHERE docs MATCH ?
+        """
+        params: List[Any] = []
+        if font:
+            sql += " AND b.fonts LIKE ?"
+            params.append("%|" + " ".join(font.lower().split()) + "|%")
+        if extraction:
+            sql += " AND b.extraction = ?"
+            params.append(extraction)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        with self._connect() as db:
+            try:
+                rows = db.execute(sql, [fts_query(query, fields)] + params).fetchall()
+            except sqlite3.OperationalError:
+                rows = db.execute(sql, [fts_query(quote_terms(query), fields)] + params).fetchall()
+        return [
+            {
+                "brand_id": row["brand_id"],
+                "title": row["title"],
+                "url": row["url"],
+                "extraction": row["extraction"],
+                "fonts": [f for f in (row["fonts"] or "").split("|") if f],
+                "snippet": row["snippet"],
+                "score": round(-row["rank"], 4),
+            }
+            for row in rows
+        ]
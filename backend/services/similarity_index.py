@@ -0,0 +1,272 @@
+import os
+import re
+import json
+import zlib
+import threading
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+from services.asset_manager import AssetManager
+
+# Palette vector: the first SLOTS colors (most prominent first) as Lab + a rank weight
+SLOTS = 8
+FONT_BITS = 256
+INITIAL_CAPACITY = 1024
+# Rows scored per vectorized block; bounds temporary memory on very large indexes
+CHUNK_ROWS = 32768
+# Lab distance at which palette similarity drops to 0.5
+PALETTE_SCALE = 20.0
+# Stand-in distance for empty slots so they never win a nearest-color match
+EMPTY_DISTANCE = 1e4
+
+GENERIC_FONTS = {
+    "serif", "sans-serif", "monospace", "cursive", "fantasy", "system-ui", "emoji", "math", "fangsong",
+    "ui-serif", "ui-sans-serif", "ui-monospace", "ui-rounded", "-apple-system", "blinkmacsystemfont",
+    "inherit", "initial", "unset", "revert", "apple color emoji", "segoe ui emoji", "segoe ui symbol", "noto color emoji",
+}
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def font_tokens(fonts: List[str]) -> List[str]:
+    # '"Helvetica Neue", Arial, sans-serif' -> ['helvetica neue', 'arial']
+    tokens = []
+    for stack in fonts:
+        for family in stack.split(","):
+            family = re.sub(r"\s+", " ", family.replace("!important", "").strip().strip("'\"").lower())
+            family = re.sub(r"\s*(variable|vf|webfont|web)$", "", family)
+            if family and family not in GENERIC_FONTS and not family.startswith("var(") and family not in tokens:
+                tokens.append(family)
+    return tokens
+
+def font_bits(tokens: List[str]) -> np.ndarray:
+    bits = np.zeros(FONT_BITS, dtype=bool)
+    for token in tokens:
+        bits[zlib.crc32(token.encode()) % FONT_BITS] = True
+    return np.packbits(bits)
+
+def hex_to_lab(hex_colors: List[str]) -> np.ndarray:
+    rgb = np.array([[int(h[i:i + 2], 16) for i in (1, 3, 5)] for h in hex_colors], dtype=np.float64) / 255
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ]) / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+def palette_vector(colors: List[str]) -> np.ndarray:
+    # (SLOTS, 4): L, a, b, weight. Weights decay with rank and sum to 1; empty slots weigh 0.
+    vector = np.zeros((SLOTS, 4), dtype=np.float32)
+    hexes = []
+    for color in colors:
+        hex_color = (AssetManager.rgb_to_hex(color) or "").lower()
+        if len(hex_color) == 7 and hex_color not in hexes:
+            hexes.append(hex_color)
+        if len(hexes) == SLOTS:
+            break
+    if hexes:
+        weights = 1 / np.arange(1, len(hexes) + 1)
+        vector[:len(hexes), :3] = hex_to_lab(hexes)
+        vector[:len(hexes), 3] = weights / weights.sum()
+    return vector
+
+def palette_distances(query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Symmetric weighted nearest-color distance in Lab between one palette and a block of rows.
+    # query (SLOTS, 4), rows (N, SLOTS, 4) -> (N,). Works slot by slot on contiguous (Q, N) planes;
+    # reductions over the tiny slot axis of an (N, 8, 8) tensor are what make the naive version slow.
+    n = len(rows)
+    valid = query[:, 3] > 0
+    q_lab, q_weight = query[valid, :3], query[valid, 3]
+    if not len(q_lab):
+        return np.full(n, EMPTY_DISTANCE, dtype=np.float32)
+    planes = np.ascontiguousarray(np.moveaxis(rows, 0, -1))  # (SLOTS, 4, N)
+    best_for_query = np.full((len(q_lab), n), EMPTY_DISTANCE, dtype=np.float32)
+    row_to_query = np.zeros(n, dtype=np.float32)
+    for slot in range(SLOTS):
+        lab, weight = planes[slot, :3], planes[slot, 3]
+        difference = lab[None, :, :] - q_lab[:, :, None]  # (Q, 3, N)
+        distance = np.sqrt((difference * difference).sum(axis=1))
+        distance[:, weight <= 0] = EMPTY_DISTANCE
+        np.minimum(best_for_query, distance, out=best_for_query)
+        row_to_query += weight * distance.min(axis=0)
+    return (q_weight @ best_for_query + row_to_query) / 2
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    # Set bits per row of a packed uint8 matrix
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return POPCOUNT[bits].sum(axis=1, dtype=np.int32)
+
+class PaletteIndex:
+    # Cross-brand index of palettes and font stacks, persisted as memory-mapped .npy matrices
+    # plus an append-only JSONL of row metadata. Rows are added as jobs finish.
+
+    def __init__(self, directory: str = "results/.index"):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.rows: Dict[str, int] = {}
+        self.meta: List[Dict[str, Any]] = []
+        self.count = 0
+        # Rows of removed brands; never reused, excluded from results
+        self.dead = set()
+        self.palettes: Optional[np.ndarray] = None
+        self.fonts: Optional[np.ndarray] = None
+        self._open()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "brands.jsonl")
+
+    def _matrix_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    row = entry["row"]
+                    while len(self.meta) <= row:
+                        self.meta.append({})
+                    if entry.get("deleted"):
+                        self.meta[row] = {}
+                        self.rows.pop(entry["brand_id"], None)
+                    else:
+                        self.meta[row] = entry
+                        self.rows[entry["brand_id"]] = row
+        self.count = len(self.meta)
+        self.dead = {row for row, entry in enumerate(self.meta) if not entry}
+        try:
+            self.palettes = np.load(self._matrix_path("palettes"), mmap_mode="r+")
+            self.fonts = np.load(self._matrix_path("fonts"), mmap_mode="r+")
+        except (OSError, ValueError):
+            self.palettes, self.fonts = None, None
+        if self.palettes is None or len(self.palettes) < self.count or len(self.fonts) < self.count:
+            # Matrices missing or behind the metadata; start clean and let backfill repopulate
+            self.rows, self.meta, self.count, self.dead = {}, [], 0, set()
+            if os.path.exists(self._meta_path):
+                os.remove(self._meta_path)
+            self._allocate(INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        # (Re)create the matrices at a larger capacity, carrying existing rows over
+        for name, shape, dtype in (("palettes", (capacity, SLOTS, 4), np.float32), ("fonts", (capacity, FONT_BITS // 8), np.uint8)):
+            tmp = self._matrix_path(name) + ".tmp"
+            matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            old = getattr(self, name)
+            if old is not None and self.count:
+                matrix[:self.count] = old[:self.count]
+            matrix.flush()
+            del matrix
+            os.replace(tmp, self._matrix_path(name))
+            setattr(self, name, np.load(self._matrix_path(name), mmap_mode="r+"))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, brand_id: str) -> bool:
+        return brand_id in self.rows
+
+    def add(self, brand_id: str, data: Dict[str, Any]):
+        brand_data = data.get("brand_data", {})
+        colors = brand_data.get("colors", [])
+        tokens = font_tokens(brand_data.get("fonts", []))
+        with self._lock:
+            row = self.rows.get(brand_id)
+            if row is None:
+                if self.count >= len(self.palettes):
+                    self._allocate(len(self.palettes) * 2)
+                row = self.count
+                self.count += 1
+                self.meta.append({})
+            self.palettes[row] = palette_vector(colors)
+            self.fonts[row] = font_bits(tokens)
+            self.palettes.flush()
+            self.fonts.flush()
+            entry = {"row": row, "brand_id": brand_id, "title": brand_data.get("title", brand_id), "colors": colors[:SLOTS], "fonts": tokens}
+            with open(self._meta_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.meta[row] = entry
+            self.rows[brand_id] = row
+
+    def remove(self, brand_id: str):
+        with self._lock:
+            row = self.rows.pop(brand_id, None)
+            if row is None:
+                return
+            self.palettes[row] = 0
+            self.fonts[row] = 0
+            with open(self._meta_path, "a") as f:
+                f.write(json.dumps({"row": row, "brand_id": brand_id, "deleted": True}) + "\n")
+            self.meta[row] = {}
+            self.dead.add(row)
+
+    def reconcile(self, base_dir: str = "results") -> Dict[str, int]:
+        # Index results written before the index existed (or while it was missing),
+        # drop brands whose results folder was evicted
+        stats = {"indexed": 0, "deleted": 0}
+        for brand_id in list(self.rows):
+            if not os.path.exists(os.path.join(base_dir, brand_id, "data.json")):
+                self.remove(brand_id)
+                stats["deleted"] += 1
+        for brand_id in sorted(os.listdir(base_dir)):
+            path = os.path.join(base_dir, brand_id, "data.json")
+            if brand_id.startswith(".") or brand_id in self.rows or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r") as f:
+                    self.add(brand_id, json.load(f))
+                stats["indexed"] += 1
+            except Exception as e:
+                print(f"Could not index {brand_id}: {e}")
+        return stats
+
+    def similar(self, brand_id: str, k: int = 10, palette_weight: float = 0.7) -> List[Dict[str, Any]]:
+        row = self.rows[brand_id]
+        with self._lock:
+            count = self.count
+            dead = [r for r in self.dead if r < count]
+            query_palette = np.array(self.palettes[row])
+            query_fonts = np.array(self.fonts[row])
+        query_font_count = int(popcount(query_fonts[None, :])[0])
+
+        scores = np.empty(count, dtype=np.float32)
+        palette_scores = np.empty(count, dtype=np.float32)
+        font_scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, count)
+            distance = palette_distances(query_palette, self.palettes[start:end])
+            palette_scores[start:end] = 1 / (1 + distance / PALETTE_SCALE)
+            fonts = self.fonts[start:end]
+            both = popcount(fonts & query_fonts)
+            either = popcount(fonts | query_fonts)
+            font_scores[start:end] = np.where(either > 0, both / np.maximum(either, 1), 0)
+        if not query_font_count:
+            # Nothing to compare typography on; rank by palette alone
+            palette_weight = 1.0
+        scores[:] = palette_weight * palette_scores + (1 - palette_weight) * font_scores
+        scores[row] = -np.inf
+        scores[dead] = -np.inf
+
+        k = max(0, min(k, count - 1))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "brand_id": self.meta[i]["brand_id"],
+                "title": self.meta[i].get("title"),
+                "score": round(float(scores[i]), 4),
+                "palette_similarity": round(float(palette_scores[i]), 4),
+                "font_similarity": round(float(font_scores[i]), 4),
+                "colors": self.meta[i].get("colors", []),
+                "fonts": self.meta[i].get("fonts", []),
+            }
+            for i in top if np.isfinite(scores[i]) and self.meta[i]
+        ]
@@ -0,0 +1,284 @@
+import re
+import html
+import asyncio
+import httpx
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional
+from urllib.parse import urljoin, urlparse
+
+from services.block_detection import detect_block, BLOCK_PAGE_MAX_SIZE
+
+# Caps keep a pathological page from turning the fast path into the slow one
+MAX_HTML_BYTES = 3 * 1024 * 1024
+MAX_CSS_BYTES = 1024 * 1024
+MAX_STYLESHEETS = 10
+# Less visible text than this (with scripts present) means a client-rendered shell
+SHELL_TEXT_THRESHOLD = 200
+
+COLOR_DECLARATION = re.compile(r"(?<![\w-])(color|background-color|background|border-color|fill|--[\w-]*(?:color|brand|primary|secondary|accent)[\w-]*)\s*:\s*([^;{}]+)", re.I)
+COLOR_TOKEN = re.compile(r"#[0-9a-fA-F]{3,8}\b|rgba?\([^)]*\)", re.I)
+FONT_DECLARATION = re.compile(r"(?<![\w-])font-family\s*:\s*([^;{}]+)", re.I)
+SHELL_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby", "svelte"}
+HEADER_TAGS = {"header", "nav"}
+MAX_SVG_CHARS = 200000
+
+def normalize_color(token: str) -> Optional[str]:
+    # Browser extraction yields 'rgb(r, g, b)'; keep the same vocabulary so rgb_to_hex works on both
+    token = token.strip().lower()
+    if token.startswith("#"):
+        digits = token[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(c * 2 for c in digits[:3])
+        elif len(digits) in (6, 8):
+            digits = digits[:6]
+        else:
+            return None
+        return f"#{digits}"
+    numbers = re.findall(r"[\d.]+%?", token)
+    if len(numbers) < 3:
+        return None
+    try:
+        rgb = [round(float(n[:-1]) * 2.55) if n.endswith("%") else int(float(n)) for n in numbers[:3]]
+        if len(numbers) > 3:
+            alpha = float(numbers[3][:-1]) / 100 if numbers[3].endswith("%") else float(numbers[3])
+            if alpha == 0:
+                return None
+    except ValueError:
+        return None
+    if any(c < 0 or c > 255 for c in rgb):
+        return None
+    return f"rgb({rgb[0]}, {rgb[1]}, {rgb[2]})"
+
+def css_colors_and_fonts(css_texts: List[str]):
+    colors = Counter()
+    fonts = Counter()
+    for css in css_texts:
+        for prop, value in COLOR_DECLARATION.findall(css):
+            # Custom properties named like brand colors are the strongest signal
+            weight = 3 if prop.startswith("--") else 1
+            for token in COLOR_TOKEN.findall(value):
+                color = normalize_color(token)
+                if color:
+                    colors[color] += weight
+        for value in FONT_DECLARATION.findall(css):
+            value = value.replace("!important", "").strip()
+            if value and not value.startswith(("inherit", "initial", "var(")):
+                fonts[value] += 1
+    return [c for c, _ in colors.most_common(10)], [f for f, _ in fonts.most_common(10)]
+
+class BrandHTMLParser(HTMLParser):
+    # Single streaming pass collecting what the browser path pulls out of the DOM
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        self.description = ""
+        self.icons: List[Dict[str, str]] = []
+        self.logos: List[Dict[str, Any]] = []
+        self.stylesheets: List[str] = []
+        self.inline_styles: List[str] = []
+        self.style_attrs: List[str] = []
+        self.text_length = 0
+        self.script_count = 0
+        self.empty_root = False
+        self._in_title = False
+        self._skip_depth = 0
+        self._style_buffer: Optional[List[str]] = None
+        self._pending_root = False
+        self._header_depth = 0
+        self._home_link = False
+        self._link_hint = False
+        # Inline <svg> being re-serialized: its pieces, nesting depth and context at open
+        self._svg: Optional[List[str]] = None
+        self._svg_depth = 0
+        self._svg_info: Dict[str, Any] = {}
+
+    def _context(self, attrs: Dict[str, str]) -> Dict[str, Any]:
+        haystack = " ".join([attrs.get("src", ""), attrs.get("class", ""), attrs.get("id", ""), attrs.get("alt", ""), attrs.get("aria-label", "")]).lower()
+        return {
+            "logo_hint": "logo" in haystack or self._link_hint,
+            "in_header": self._header_depth > 0,
+            "links_home": self._home_link,
+        }
+
+    def _is_home(self, href: str) -> bool:
+        target = urlparse(urljoin(self.base_url, href))
+        return target.netloc == urlparse(self.base_url).netloc and target.path in ("", "/")
+
+    def handle_startendtag(self, tag, attrs):
+        if self._svg is not None:
+            self._svg.append(self.get_starttag_text())
+            return
+        if tag != "svg":
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if self._pending_root:
+            self._pending_root = False
+        if self._svg is not None:
+            self._svg.append(self.get_starttag_text())
+            if tag == "svg":
+                self._svg_depth += 1
+            return
+        if tag == "svg":
+            self._svg = [self.get_starttag_text()]
+            self._svg_depth = 1
+            self._svg_info = self._context(attrs)
+            return
+        if tag in HEADER_TAGS:
+            self._header_depth += 1
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta" and attrs.get("name", "").lower() == "description":
+            self.description = attrs.get("content", "")
+        elif tag == "link":
+            rel = attrs.get("rel", "").lower()
+            href = attrs.get("href")
+            if href and "icon" in rel:
+                self.icons.append({"url": urljoin(self.base_url, href), "rel": rel, "sizes": attrs.get("sizes", "")})
+            elif href and "stylesheet" in rel:
+                self.stylesheets.append(urljoin(self.base_url, href))
+        elif tag == "a":
+            self._home_link = bool(attrs.get("href")) and self._is_home(attrs["href"])
+            self._link_hint = "logo" in " ".join([attrs.get("class", ""), attrs.get("aria-label", "")]).lower()
+        elif tag == "img":
+            src = attrs.get("src", "")
+            context = self._context(attrs)
+            if src and (context["logo_hint"] or (context["in_header"] and context["links_home"])):
+                self.logos.append({"type": "logo", "url": urljoin(self.base_url, src), **context})
+        elif tag == "script":
+            self.script_count += 1
+            self._skip_depth += 1
+        elif tag in ("noscript", "template"):
+            self._skip_depth += 1
+        elif tag == "style":
+            self._style_buffer = []
+        elif tag == "div" and attrs.get("id", "").lower() in SHELL_ROOT_IDS:
+            self._pending_root = True
+        if attrs.get("style"):
+            self.style_attrs.append(attrs["style"])
+
+    def handle_endtag(self, tag):
+        if self._svg is not None:
+            self._svg.append(f"</{tag}>")
+            if tag == "svg":
+                self._svg_depth -= 1
+                if self._svg_depth == 0:
+                    self._finish_svg()
+            return
+        if tag in HEADER_TAGS and self._header_depth:
+            self._header_depth -= 1
+        if tag == "a":
+            self._home_link = False
+            self._link_hint = False
+        if tag == "title":
+            self._in_title = False
+        elif tag in ("script", "noscript", "template"):
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "style" and self._style_buffer is not None:
+            self.inline_styles.append("".join(self._style_buffer))
+            self._style_buffer = None
+        elif tag == "div" and self._pending_root:
+            # <div id="root"></div> with nothing inside: the app mounts client-side
+            self.empty_root = True
+            self._pending_root = False
+
+    def _finish_svg(self):
+        content = "".join(self._svg)
+        info = self._svg_info
+        self._svg = None
+        if (info["logo_hint"] or (info["in_header"] and info["links_home"])) and len(content) <= MAX_SVG_CHARS:
+            if "xmlns=" not in content[:content.find(">")]:
+                content = content.replace("<svg", '<svg xmlns="http://www.w3.org/2000/svg"', 1)
+            self.logos.append({"type": "logo_svg", "content": content, **info})
+
+    def handle_data(self, data):
+        if self._svg is not None:
+            self._svg.append(html.escape(data, quote=False))
+            return
+        if self._style_buffer is not None:
+            self._style_buffer.append(data)
+            return
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        stripped = data.strip()
+        if stripped:
+            self._pending_root = False
+            self.text_length += len(stripped)
+
+    def is_js_shell(self) -> bool:
+        return self.script_count > 0 and (self.empty_root or self.text_length < SHELL_TEXT_THRESHOLD)
+
+class StaticScraper:
+    def __init__(self, headers: Dict[str, str], timeout: float = 15):
+        self.headers = headers
+        self.timeout = timeout
+
+    async def _fetch_css(self, client: httpx.AsyncClient, url: str) -> str:
+        try:
+            response = await client.get(url)
+            if response.status_code == 200:
+                return response.text[:MAX_CSS_BYTES]
+        except Exception as e:
+            print(f"Failed to fetch stylesheet {url}: {e}")
+        return ""
+
+    async def analyze(self, url: str) -> Optional[Dict[str, Any]]:
+        # Returns None when the page needs a real browser (JS shell, error status, non-HTML)
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout, follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                if response.status_code != 200 or "html" not in response.headers.get("content-type", "html"):
+                    print(f"[{url}] Static fetch not usable (HTTP {response.status_code}); using browser")
+                    return None
+                final_url = str(response.url)
+                parser = BrandHTMLParser(final_url)
+                received = 0
+                head = []
+                async for chunk in response.aiter_text():
+                    parser.feed(chunk)
+                    if received <= BLOCK_PAGE_MAX_SIZE:
+                        head.append(chunk)
+                    received += len(chunk)
+                    if received > MAX_HTML_BYTES:
+                        break
+                parser.close()
+
+            reason = detect_block("".join(head)) if received <= BLOCK_PAGE_MAX_SIZE else ""
+            if reason:
+                print(f"[{url}] Static fetch looks blocked ({reason}); using browser")
+                return None
+
+            if parser.is_js_shell():
+                print(f"[{url}] Static HTML is a JS shell ({parser.text_length} chars of text); using browser")
+                return None
+
+            stylesheets = parser.stylesheets[:MAX_STYLESHEETS]
+            sheet_texts = await asyncio.gather(*(self._fetch_css(client, s) for s in stylesheets))
+
+        colors, fonts = css_colors_and_fonts(list(sheet_texts) + parser.inline_styles + parser.style_attrs)
+
+        assets = [{"type": "favicon", **icon} for icon in parser.icons]
+        assets += parser.logos
+        css = [{"type": "external_css", "url": s} for s in parser.stylesheets]
+        # Same rule as the browser path: the first few significant inline styles, capped
+        css += [
+            {"type": "inline_css", "content": style[:5000]}
+            for style in parser.inline_styles[:3] if len(style.strip()) > 100
+        ]
+
+        return {
+            "url": url,
+            "title": parser.title.strip() or url,
+            "description": parser.description,
+            "assets": assets,
+            "fonts": fonts,
+            "colors": colors,
+            "css": css,
+        }
@@ -0,0 +1,117 @@
+import os
+import time
+import asyncio
+import importlib
+from typing import Dict, Any, Optional
+
+from services.metrics import STARTUP_SECONDS
+
+# Modules the API does not need to answer /status or serve cached results, but every job does.
+# Importing them up front is what used to make cold starts slow.
+HEAVY_MODULES = [
+    "services.scraper_service",
+    "services.crawler_service",
+    "services.gemini_computer_use_service",
+    "services.pdf_generator",
+]
+
+def process_uptime() -> Optional[float]:
+    # Seconds since the OS started this process (covers interpreter and uvicorn startup too); Linux only
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return None
+
+class Warmup:
+    # Tracks cold-start timings and the background warmup that runs after the app starts serving:
+    # heavy imports, the shared Chromium, the Gemini client and PDF resources.
+
+    def __init__(self, import_started: float):
+        self.import_started = import_started
+        self.timings: Dict[str, float] = {}
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.first_requests: Dict[str, float] = {}
+        self.first_job: Optional[Dict[str, Any]] = None
+        self.done = False
+
+    def record(self, phase: str, seconds: float):
+        self.timings[phase] = round(seconds, 4)
+        STARTUP_SECONDS.set(round(seconds, 4), phase=phase)
+
+    def imported(self):
+        self.record("import", time.perf_counter() - self.import_started)
+
+    def serving(self):
+        # Lifespan entered: the app accepts requests from here on
+        self.record("serve", time.perf_counter() - self.import_started)
+        uptime = process_uptime()
+        if uptime is not None:
+            self.record("process_to_serve", uptime)
+
+    async def _phase(self, name: str, fn):
+        self.phases[name] = {"status": "running"}
+        started = time.perf_counter()
+        try:
+            await fn()
+            self.phases[name] = {"status": "ready"}
+        except Exception as e:
+            print(f"Warmup of {name} failed: {e}")
+            self.phases[name] = {"status": "failed", "error": str(e)}
+        self.phases[name]["seconds"] = round(time.perf_counter() - started, 4)
+        self.record(f"warmup_{name}", self.phases[name]["seconds"])
+
+    async def run(self, browser_pool, gemini_client, pdf_preload):
+        started = time.perf_counter()
+        for name in ("imports", "browser", "gemini", "pdf"):
+            self.phases[name] = {"status": "pending"}
+
+        async def imports():
+            for module in HEAVY_MODULES:
+                await asyncio.to_thread(importlib.import_module, module)
+
+        await self._phase("imports", imports)
+        # Independent of each other; the browser launch is the long pole
+        await asyncio.gather(
+            self._phase("browser", browser_pool.start),
+            self._phase("gemini", lambda: asyncio.to_thread(gemini_client)),
+            self._phase("pdf", lambda: asyncio.to_thread(pdf_preload)),
+        )
+        self.record("warmup", time.perf_counter() - started)
+        self.done = True
+        print(f"Warmup finished in {self.timings['warmup']:.2f}s: " + ", ".join(f"{k}={v['status']}" for k, v in self.phases.items()))
+
+    def skip(self):
+        self.phases = {"warmup": {"status": "disabled"}}
+        self.done = True
+
+    def request_finished(self, route: str, seconds: float):
+        # Latency of the first request per route, and of the very first request overall
+        if route in self.first_requests:
+            return
+        self.first_requests[route] = round(seconds, 4)
+        if len(self.first_requests) == 1:
+            self.record("first_request", seconds)
+
+    def job_finished(self, seconds: float, status: str, warm: bool):
+        if self.first_job is None:
+            self.first_job = {"seconds": round(seconds, 4), "status": status, "after_warmup": warm}
+            self.record("first_job", seconds)
+
+    def state(self) -> Dict[str, Any]:
+        failed = [name for name, phase in self.phases.items() if phase["status"] == "failed"]
+        if not self.done:
+            status = "warming"
+        else:
+            status = "degraded" if failed else "ready"
+        return {
+            "status": status,
+            "ready": self.done,
+            "timings": self.timings,
+            "phases": self.phases,
+            "first_requests": self.first_requests,
+            "first_job": self.first_job,
+        }
@@ -1,6 +1,7 @@
 import asyncio
 import os
 from services.gemini_computer_use_service import GeminiComputerUseService
+from services.browser_pool import browser_pool
 from dotenv import load_dotenv
 
 # Load environment variables (GOOGLE_CLOUD_PROJECT, etc.)
@@ -13,11 +14,14 @@ async def main():
     prompt = "Go to https://www.myntra.com and find the brand's primary colors, fonts and logo. Describe them."
     
     print(f"Starting task: {prompt}")
-    result = await service.execute_task(
-        prompt=prompt,
-        start_url="https://www.myntra.com",
-        turn_limit=10
-    )
+    try:
+        result = await service.execute_task(
+            prompt=prompt,
+            start_url="https://www.myntra.com",
+            turn_limit=10
+        )
+    finally:
+        await browser_pool.close()
     
     print("\n" + "="*50)
     print("FINAL RESULT")
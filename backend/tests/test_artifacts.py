@@ -0,0 +1,43 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.artifacts import ArtifactFiles, IMMUTABLE, REVALIDATE, content_version
+
+@pytest.fixture
+def client(tmp_path):
+    os.makedirs(tmp_path / ".index")
+    os.makedirs(tmp_path / ".bundles")
+    os.makedirs(tmp_path / "acme" / ".thumbs")
+    (tmp_path / ".index" / "search.db").write_bytes(b"SQLite format 3\x00")
+    (tmp_path / ".bundles" / "abc.zip").write_bytes(b"PK")
+    (tmp_path / "acme" / ".thumbs" / "t.webp").write_bytes(b"RIFF")
+    (tmp_path / "acme" / "logo.png").write_bytes(b"\x89PNG" + b"0" * 100)
+    app = FastAPI()
+    app.mount("/results", ArtifactFiles(directory=str(tmp_path)), name="results")
+    return TestClient(app), tmp_path
+
+@pytest.mark.parametrize("path", [
+    "/results/.index/search.db",
+    "/results/.bundles/abc.zip",
+    "/results/acme/.thumbs/t.webp",
+])
+def test_dot_entries_are_not_served(client, path):
+    http, _ = client
+    assert http.get(path).status_code == 404
+
+def test_brand_artifacts_are_served(client):
+    http, _ = client
+    response = http.get("/results/acme/logo.png")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == REVALIDATE
+
+def test_immutable_only_for_current_version(client):
+    http, root = client
+    version = content_version(str(root / "acme" / "logo.png"))
+    assert http.get(f"/results/acme/logo.png?v={version}").headers["cache-control"] == IMMUTABLE
+    assert http.get("/results/acme/logo.png?v=0000").headers["cache-control"] == REVALIDATE
+    assert http.get("/results/acme/logo.png?nav=1").headers["cache-control"] == REVALIDATE
+    assert http.get("/results/acme/logo.png?dev=x").headers["cache-control"] == REVALIDATE
@@ -0,0 +1,39 @@
+import io
+import os
+import zipfile
+
+from services.bundle import BundleCache, bundle_files
+
+def make_tree(root):
+    os.makedirs(root / "acme" / "CSS")
+    os.makedirs(root / "acme" / ".thumbs")
+    (root / "acme" / "data.json").write_text('{"a": 1}' * 200)
+    (root / "acme" / "data.json.gz").write_bytes(b"gz")
+    (root / "acme" / "logo.png").write_bytes(os.urandom(2048))
+    (root / "acme" / "CSS" / "style_0.css").write_text("body{}" * 500)
+    (root / "acme" / ".thumbs" / "t.webp").write_bytes(b"RIFF")
+
+def test_stream_skips_internal_files_and_stores_images(tmp_path):
+    make_tree(tmp_path / "results")
+    cache = BundleCache(str(tmp_path / "bundles"), max_entries=0)
+    data = b"".join(cache.stream("k", bundle_files(str(tmp_path / "results"), ["acme"])))
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    infos = {i.filename: i for i in archive.infolist()}
+    assert sorted(infos) == ["acme/CSS/style_0.css", "acme/data.json", "acme/logo.png"]
+    assert infos["acme/logo.png"].compress_type == zipfile.ZIP_STORED
+    assert infos["acme/data.json"].compress_type == zipfile.ZIP_DEFLATED
+    # Cache disabled: nothing written
+    assert not os.path.exists(tmp_path / "bundles")
+
+def test_cache_keeps_only_completed_bundles(tmp_path):
+    make_tree(tmp_path / "results")
+    files = bundle_files(str(tmp_path / "results"), ["acme"])
+    cache = BundleCache(str(tmp_path / "bundles"), max_entries=2)
+    aborted = cache.stream("aborted", files)
+    next(aborted)
+    aborted.close()
+    assert os.listdir(tmp_path / "bundles") == []
+    path = cache.build("done", files)
+    assert cache.path("done") == path
+    assert zipfile.ZipFile(path).testzip() is None
@@ -0,0 +1,40 @@
+from urllib.robotparser import RobotFileParser
+
+from services.crawler_service import Frontier, robots_allows, score_link
+
+def test_score_link_prefers_shallow_brand_pages():
+    assert score_link("https://acme.com/brand-guidelines") > score_link("https://acme.com/blog")
+    assert score_link("https://acme.com/about") > score_link("https://acme.com/en/us/team/about")
+    assert score_link("https://acme.com/press") > score_link("https://acme.com/press?page=2")
+    assert score_link("https://acme.com/x", "Our story") > score_link("https://acme.com/x")
+
+def test_score_link_skips_stateful_pages():
+    assert score_link("https://acme.com/login") < 0
+    assert score_link("https://acme.com/about", "Privacy policy") < 0
+
+def test_frontier_only_keeps_new_same_origin_pages():
+    frontier = Frontier("https://www.acme.com/")
+    assert frontier.add("/about", "https://www.acme.com/")
+    assert not frontier.add("https://www.acme.com/about/#team", "https://www.acme.com/")
+    assert not frontier.add("https://other.com/about", "https://www.acme.com/")
+    assert not frontier.add("/press-kit.pdf", "https://www.acme.com/")
+    assert not frontier.add("mailto:press@acme.com", "https://www.acme.com/")
+    assert not frontier.add("/checkout", "https://www.acme.com/")
+    assert len(frontier) == 1
+
+def test_frontier_is_bounded_and_drops_the_lowest_ranked():
+    frontier = Frontier("https://acme.com/", max_size=3)
+    for path in ["/a/b/c/d", "/brand", "/x/y", "/about", "/guidelines"]:
+        frontier.add(path, "https://acme.com/")
+    assert len(frontier) == 3
+    popped = [frontier.pop() for _ in range(3)]
+    assert popped == ["https://acme.com/guidelines", "https://acme.com/brand", "https://acme.com/about"]
+    assert frontier.pop() is None
+
+def test_robots_disallow_is_honoured():
+    robots = RobotFileParser()
+    robots.parse(["User-agent: *", "Disallow: /press", "Allow: /"])
+    assert robots_allows(robots, "https://acme.com/about")
+    assert not robots_allows(robots, "https://acme.com/press/kit")
+    # No robots.txt: everything is allowed
+    assert robots_allows(None, "https://acme.com/press/kit")
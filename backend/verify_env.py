@@ -24,7 +24,7 @@ async def verify():
     print("\nTesting GeminiService...")
     try:
         gemini = GeminiService()
-        if gemini.client:
+        if await gemini.ensure_client():
             print("Gemini initialized.")
             # Simple test
             print("Sending test request to Gemini...")
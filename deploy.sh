@@ -20,6 +20,7 @@ gcloud run deploy brand-backend \
     --port 8000 \
     --memory 2Gi \
     --cpu 1 \
+    --cpu-boost \
     --set-env-vars GOOGLE_CLOUD_PROJECT=$PROJECT_ID,GOOGLE_CLOUD_LOCATION=$REGION
 
 # Get Backend URL
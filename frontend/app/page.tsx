@@ -32,7 +32,8 @@ export default function Home() {
       const res = await fetch(`${API_BASE}/analyze`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ url: targetUrl })
+        // We poll /status every second, so a job nobody polls for 90s was abandoned (closed tab)
+        body: JSON.stringify({ url: targetUrl, abandon_after: 90 })
       });
       const json = await res.json();
       setTaskId(json.task_id);
@@ -54,9 +55,14 @@ export default function Home() {
           if (json.logs) setLogs(json.logs);
           
           if (json.status === 'completed') {
-            setData(json.data);
-            setStatus('completed');
             clearInterval(interval);
+            // Status is slim; fetch the sections the dashboard renders
+            const [summary, guidelines] = await Promise.all([
+              fetch(`${API_BASE}${json.links.summary}`).then(r => r.json()),
+              fetch(`${API_BASE}${json.links.guidelines}`).then(r => r.text()),
+            ]);
+            setData({ ...summary, guidelines });
+            setStatus('completed');
           } else if (json.status === 'failed') {
             setStatus('failed');
             clearInterval(interval);
@@ -14,18 +14,19 @@ interface ResultsProps {
   data: {
     brand_data: BrandData;
     guidelines: string;
-    report: string;
+    report?: string;
     pdf_url?: string;
     screenshot_url?: string;
     assets_urls?: string[];
     css_urls?: string[];
+    thumbnail_urls?: { screenshot?: string; assets?: string[] };
   };
 }
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
 export default function ResultsDashboard({ data }: ResultsProps) {
-  const { brand_data, guidelines, pdf_url, screenshot_url, assets_urls, css_urls } = data;
+  const { brand_data, guidelines, pdf_url, screenshot_url, assets_urls, css_urls, thumbnail_urls } = data;
 
   return (
     <div className="w-full max-w-6xl mx-auto p-6 space-y-8 animate-in fade-in duration-700">
@@ -95,7 +96,7 @@ export default function ResultsDashboard({ data }: ResultsProps) {
              <div className="flex flex-wrap gap-4">
                {assets_urls?.map((url, i) => (
                  <div key={i} className="w-24 h-24 p-4 bg-white/10 rounded-xl flex items-center justify-center hover:bg-white/20 transition-colors border border-white/5">
-                   <img src={`${API_BASE}${url}`} className="max-w-full max-h-full object-contain" alt="asset" />
+                   <img src={`${API_BASE}${thumbnail_urls?.assets?.[i] ?? url}`} loading="lazy" className="max-w-full max-h-full object-contain" alt="asset" />
                  </div>
                ))}
              </div>